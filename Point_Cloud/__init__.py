@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Point cloud ingestion and analysis helpers used by analyze_point_cloud.py."""
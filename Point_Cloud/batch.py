@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Batch scheduling: expand scan arguments, run scans in a pool within a memory budget."""
+
+import csv
+import glob
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from Point_Cloud.readers import declared_point_count
+
+# Rough peak bytes per input point of the in-memory pipeline: compact columns,
+# downsample keys, the Open3D cloud with normals and its KD-tree, RANSAC buffers
+BYTES_PER_POINT = 200
+# Bytes per PTS line, for files whose header cannot be read
+BYTES_PER_LINE = 50
+
+SUMMARY_COLUMNS = ("scan", "status", "points", "surfaces", "seconds", "output_dir")
+
+
+def expand_inputs(patterns):
+    """Files named by patterns (paths or globs), deduplicated, in argument order."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def estimate_memory(path):
+    """Estimated peak bytes to analyze path, from its declared point count."""
+    try:
+        num_points = declared_point_count(path)
+    except (IOError, OSError, ValueError):
+        num_points = (
+            os.path.getsize(path) // BYTES_PER_LINE if os.path.exists(path) else 0
+        )
+    return num_points * BYTES_PER_POINT
+
+
+def scan_output_dirs(paths, root):
+    """One output folder per scan under root, named after the file stem."""
+    directories = []
+    used = set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+        name = stem
+        suffix = 2
+        while name.lower() in used:
+            name = "{}_{}".format(stem, suffix)
+            suffix += 1
+        used.add(name.lower())
+        directories.append(os.path.join(root, name))
+    return directories
+
+
+def run_batch(scans, analyze, jobs, memory_budget=0, log=print):
+    """Run analyze(scan) for every scan dict in up to jobs processes.
+
+    A scan only starts while the estimated memory of all running scans plus
+    its own stays within memory_budget bytes (0 = no limit); one scan always
+    runs, however large. Waiting scans that fit are started ahead of larger
+    ones. Returns the summary rows in the order of scans.
+    """
+    pending = list(range(len(scans)))
+    rows = [None] * len(scans)
+    running = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for index in list(pending):
+                if len(running) >= jobs:
+                    break
+                in_use = sum(scans[other]["memory"] for other in running.values())
+                if (
+                    running
+                    and memory_budget
+                    and in_use + scans[index]["memory"] > memory_budget
+                ):
+                    continue
+                pending.remove(index)
+                running[executor.submit(analyze, scans[index])] = index
+                log("Started " + scans[index]["path"])
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    rows[index] = future.result()
+                except Exception as error:
+                    rows[index] = failed_row(scans[index], error)
+                log(
+                    "Finished {}: {}".format(
+                        scans[index]["path"], rows[index]["status"]
+                    )
+                )
+    return rows
+
+
+def failed_row(scan, error):
+    """Summary row of a scan whose analysis raised error."""
+    return {
+        "scan": scan["path"],
+        "status": "failed: {}".format(error),
+        "points": None,
+        "surfaces": None,
+        "seconds": None,
+        "output_dir": scan["output_dir"],
+    }
+
+
+def format_cell(column, value):
+    """Text of one summary table cell."""
+    if value is None:
+        return ""
+    if column == "seconds":
+        return "{:.1f}".format(value)
+    return str(value)
+
+
+def format_summary(rows):
+    """Fixed-width text table of summary rows."""
+    table = [SUMMARY_COLUMNS] + [
+        tuple(format_cell(column, row[column]) for column in SUMMARY_COLUMNS)
+        for row in rows
+    ]
+    widths = [max(len(line[index]) for line in table) for index in range(len(table[0]))]
+    return "\n".join(
+        "  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip()
+        for line in table
+    )
+
+
+def write_summary(rows, path):
+    """Write summary rows as CSV."""
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
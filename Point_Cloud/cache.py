@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""Binary columnar cache of parsed point clouds, stored as memory-mappable .npy files.
+
+Besides the parsed columns, the cache holds derived columns (downsampled
+points, normals) keyed by a digest of the parameters that produced them.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from Point_Cloud.pts_reader import PointCloudData
+
+CACHE_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+CLOUD_COLUMNS = ("points", "colors", "intensity")
+
+
+def source_key(path):
+    """Identify a source file by absolute path, byte size and modification time."""
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def derived_key(params):
+    """Short stable digest of the parameters a derived column was computed with."""
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+class PointCloudCache(object):
+    """Column files and manifest for one source point cloud."""
+
+    def __init__(self, cache_root, source_path, transform=None):
+        self.source = source_key(source_path)
+        digest = hashlib.sha1(self.source["path"].lower().encode("utf-8")).hexdigest()
+        stem = os.path.splitext(os.path.basename(source_path))[0].replace(" ", "_")
+        name = stem + "_" + digest[:12]
+        if transform is not None:
+            # Transformed columns live apart from the untransformed ones
+            self.source["transform"] = np.asarray(transform).tolist()
+            name += "_t" + derived_key(self.source["transform"])
+        self.directory = os.path.join(cache_root, name)
+        self.manifest_path = os.path.join(self.directory, MANIFEST_NAME)
+
+    def read_manifest(self):
+        """Return the stored manifest, or None when missing or unreadable."""
+        try:
+            with open(self.manifest_path, "r") as file:
+                return json.load(file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def is_valid(self):
+        """True when the manifest matches the current source path, size and mtime."""
+        manifest = self.read_manifest()
+        return (
+            manifest is not None
+            and manifest.get("version") == CACHE_VERSION
+            and manifest.get("source") == self.source
+        )
+
+    def column_path(self, name):
+        """Path of the .npy file holding column name."""
+        return os.path.join(self.directory, name + ".npy")
+
+    def create_column(self, name, shape, dtype):
+        """Create a writable, memory-mapped .npy column of the given shape."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        return np.lib.format.open_memmap(
+            self.column_path(name), mode="w+", dtype=dtype, shape=tuple(shape)
+        )
+
+    def load(self):
+        """Open the cached columns as read-only memory maps."""
+        manifest = self.read_manifest()
+        columns = {}
+        for name in CLOUD_COLUMNS:
+            if name in manifest["columns"]:
+                columns[name] = np.load(self.column_path(name), mmap_mode="r")
+        return PointCloudData(
+            columns["points"],
+            columns.get("colors"),
+            columns.get("intensity"),
+            manifest["origin"],
+        )
+
+    def store(self, cloud):
+        """Write the cloud's columns, then the manifest that marks them valid."""
+        self.invalidate()
+        columns = {}
+        for name in CLOUD_COLUMNS:
+            array = getattr(cloud, name)
+            if array is None:
+                continue
+            np.save(self.column_path(name), np.ascontiguousarray(array))
+            columns[name] = {"dtype": str(array.dtype), "shape": list(array.shape)}
+        self.write_manifest(columns, len(cloud), cloud.origin)
+
+    def derived_path(self, name, params):
+        """Path of the .npy file holding column name computed with params."""
+        return self.column_path(name + "_" + derived_key(params))
+
+    def load_derived(self, name, params):
+        """Open a derived column computed with params, or None when not cached."""
+        if not self.is_valid():
+            return None
+        entry = (
+            self.read_manifest()
+            .get("derived", {})
+            .get(name + "_" + derived_key(params))
+        )
+        path = self.derived_path(name, params)
+        if entry is None or not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode="r")
+
+    def create_derived(self, name, params, shape, dtype):
+        """Create a writable, memory-mapped derived column; commit it when filled."""
+        return np.lib.format.open_memmap(
+            self.derived_path(name, params), mode="w+", dtype=dtype, shape=tuple(shape)
+        )
+
+    def store_derived(self, name, params, array):
+        """Write a derived column, then record it and its params in the manifest."""
+        np.save(self.derived_path(name, params), np.ascontiguousarray(array))
+        self.commit_derived(name, params)
+
+    def commit_derived(self, name, params):
+        """Record a fully written derived column in the manifest."""
+        manifest = self.read_manifest()
+        manifest.setdefault("derived", {})[name + "_" + derived_key(params)] = {
+            "name": name,
+            "params": params,
+        }
+        self.replace_manifest(manifest)
+
+    def write_manifest(self, columns, num_points, origin):
+        """Atomically replace the manifest for the current source."""
+        manifest = {
+            "version": CACHE_VERSION,
+            "source": self.source,
+            "num_points": num_points,
+            "origin": [float(value) for value in origin],
+            "columns": columns,
+        }
+        self.replace_manifest(manifest)
+
+    def replace_manifest(self, manifest):
+        """Write manifest to a temporary file and swap it in."""
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(manifest, file, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+    def invalidate(self):
+        """Drop the manifest and column files so stale data is never reused."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+            return
+        for name in os.listdir(self.directory):
+            if name == MANIFEST_NAME or name.endswith(".npy"):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Checkpoint manifest of one analysis run, so a rerun with --resume skips finished work.
+
+checkpoint.json records the finished stages (with small results such as the
+detected surfaces) under a key made of an input fingerprint and the run
+parameters. Finished tiles are appended to a JSON-lines journal, one line
+per tile, so a crash loses at most the tile that was in progress.
+"""
+
+import hashlib
+import json
+import os
+
+CHECKPOINT_VERSION = 2
+MANIFEST_NAME = "checkpoint.json"
+TILE_JOURNAL_NAME = "checkpoint_tiles.jsonl"
+
+# Blocks hashed from evenly spaced offsets; reading them is instant even for huge scans
+# but misses an in-place edit between them, which the modification time catches
+FINGERPRINT_BLOCKS = 16
+FINGERPRINT_BLOCK_BYTES = 64 * 1024
+
+
+def fingerprint(path):
+    """SHA-1 over the file size, modification time and sampled blocks of the file.
+
+    Hashing the whole file would take minutes on a multi-gigabyte scan, so
+    only the sampled blocks are read. Like cache.source_key, the modification
+    time stands in for the unread bytes: an edit anywhere changes the key,
+    while a copy that does not keep the time forces a fresh run.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    digest = hashlib.sha1("{} {}".format(size, stat.st_mtime_ns).encode("ascii"))
+    with open(path, "rb") as file:
+        last_offset = max(size - FINGERPRINT_BLOCK_BYTES, 0)
+        for index in range(FINGERPRINT_BLOCKS):
+            file.seek(last_offset * index // (FINGERPRINT_BLOCKS - 1))
+            digest.update(file.read(FINGERPRINT_BLOCK_BYTES))
+    return digest.hexdigest()
+
+
+class Checkpoint(object):
+    """Finished stages and tiles of one run in directory."""
+
+    def __init__(self, directory, source_path, params, resume=False):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.journal_path = os.path.join(directory, TILE_JOURNAL_NAME)
+        self.key = {"input": fingerprint(source_path), "params": params}
+        self.resumed = False
+        self.tiles = {}
+
+        manifest = self._read_manifest() if resume else None
+        if manifest is not None and manifest.get("key") == self.key:
+            self.manifest = manifest
+            self.tiles = self._read_journal()
+            self.resumed = True
+        else:
+            self.reset()
+
+    def reset(self):
+        """Forget all finished work and start a fresh manifest."""
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.tiles = {}
+        self.manifest = {"version": CHECKPOINT_VERSION, "key": self.key, "stages": {}}
+        self._write_manifest()
+
+    def done(self, stage):
+        """True when stage finished in this or a resumed run."""
+        return stage in self.manifest["stages"]
+
+    def result(self, stage):
+        """Stored result of a finished stage, or None."""
+        return self.manifest["stages"].get(stage, {}).get("result")
+
+    def complete(self, stage, result=None):
+        """Record stage as finished, with an optional JSON-serializable result."""
+        entry = {}
+        if result is not None:
+            entry["result"] = result
+        self.manifest["stages"][stage] = entry
+        self._write_manifest()
+
+    def tile_result(self, key):
+        """Stored fragments of a finished tile, or None."""
+        return self.tiles.get(tuple(key))
+
+    def complete_tile(self, key, fragments):
+        """Append a finished tile and its fragments to the journal, durably."""
+        self.tiles[tuple(key)] = fragments
+        with open(self.journal_path, "a") as file:
+            file.write(json.dumps({"tile": list(key), "fragments": fragments}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _read_manifest(self):
+        """The stored manifest, or None when missing, unreadable or outdated."""
+        try:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (IOError, OSError, ValueError):
+            return None
+        if manifest.get("version") != CHECKPOINT_VERSION:
+            return None
+        return manifest
+
+    def _read_journal(self):
+        """Finished tiles from the journal; a torn last line is dropped."""
+        tiles = {}
+        if not os.path.exists(self.journal_path):
+            return tiles
+        torn = False
+        with open(self.journal_path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    torn = True
+                    break
+                tiles[tuple(entry["tile"])] = entry["fragments"]
+        if torn:
+            # Rewrite the intact entries so new tiles append after a whole line
+            with open(self.journal_path, "w") as file:
+                for key, fragments in tiles.items():
+                    file.write(
+                        json.dumps({"tile": list(key), "fragments": fragments}) + "\n"
+                    )
+        return tiles
+
+    def _write_manifest(self):
+        """Atomically replace checkpoint.json."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self.manifest, file, indent=4)
+        os.replace(temp_path, self.manifest_path)
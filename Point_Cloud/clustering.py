@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Voxel-hash connected components: group points into building masses in linear time.
+
+Points are hashed to cubic cells; occupied cells that touch (26-connectivity)
+are linked by looking up each cell's forward neighbours in the sorted cell
+keys, and scipy's connected components labels the cell graph. No per-point
+neighbour search is done, so the cost is a sort plus a few vectorized passes.
+"""
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from Point_Cloud.pts_reader import to_world
+
+# Cell edge in meters: gaps narrower than this keep masses connected
+CLUSTER_VOXEL_SIZE = 0.5
+# Clusters with fewer points are dropped as clutter
+MIN_CLUSTER_POINTS = 500
+# Points closer than this (meters) to a ground plane count as ground
+GROUND_CLEARANCE = 0.3
+# Plan cell in meters of the scan's lower envelope (lowest height per cell)
+ENVELOPE_CELL_SIZE = 2.0
+# Points up to this far (meters) above the lowest point around them are on the envelope
+ENVELOPE_TOLERANCE = 1.0
+# Horizontal planes with at least this share of inliers on the envelope are ground
+ENVELOPE_FRACTION = 0.5
+
+# The 8 plan neighbours of a cell
+_PLAN_NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+# Half of the 26 neighbour offsets; the other half is covered from the far side
+FORWARD_OFFSETS = np.array(
+    [
+        (dx, dy, dz)
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+        for dz in (-1, 0, 1)
+        if (dx, dy, dz) > (0, 0, 0)
+    ]
+)
+
+
+def lower_envelope(points, cell_size=ENVELOPE_CELL_SIZE):
+    """Plan cell key and lowest height in the 3 x 3 cells around every point.
+
+    Floors and flat roofs have lower points (the ground, the floor below)
+    within a cell or two; the ground itself is the lowest thing around.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    # One cell of padding on every side keeps neighbour keys inside the grid
+    cells = np.floor((points[:, :2] - points[:, :2].min(axis=0)) / cell_size)
+    cells = cells.astype(np.int64) + 1
+    height = cells[:, 1].max() + 2
+    keys = cells[:, 0] * height + cells[:, 1]
+
+    # Sorted by cell and height, the first point of every cell is its lowest
+    order = np.lexsort((points[:, 2], keys))
+    starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+    cell_keys = keys[order[starts]]
+    lowest = points[order[starts], 2]
+    envelope = lowest.copy()
+    for dx, dy in _PLAN_NEIGHBOURS:
+        neighbours = cell_keys + dx * height + dy
+        found = np.minimum(np.searchsorted(cell_keys, neighbours), len(cell_keys) - 1)
+        hit = cell_keys[found] == neighbours
+        envelope[hit] = np.minimum(envelope[hit], lowest[found[hit]])
+    return keys, envelope[np.searchsorted(cell_keys, keys)]
+
+
+def ground_planes(
+    points,
+    labels,
+    candidates,
+    envelope,
+    tolerance=ENVELOPE_TOLERANCE,
+    fraction=ENVELOPE_FRACTION,
+):
+    """The candidate planes (ids) whose inliers mostly lie on the lower envelope.
+
+    Candidates are the horizontal planes; floors and flat roofs among them
+    have lower points around and are left out.
+    """
+    labelled = np.flatnonzero(labels >= 0)
+    if not len(labelled) or not len(candidates):
+        return []
+    on_envelope = points[labelled, 2] - envelope[labelled] <= tolerance
+    totals = np.bincount(labels[labelled])
+    hits = np.bincount(labels[labelled], weights=on_envelope, minlength=len(totals))
+    return [
+        plane_id
+        for plane_id in candidates
+        if plane_id < len(totals) and hits[plane_id] >= fraction * totals[plane_id]
+    ]
+
+
+def off_ground(
+    points,
+    labels,
+    ground_ids,
+    ground_models,
+    keys,
+    envelope,
+    clearance=GROUND_CLEARANCE,
+):
+    """Mask of points that are neither ground inliers nor loose ground points.
+
+    A loose point counts as ground when it is within clearance of a ground
+    plane [a, b, c, d] and of the lower envelope, in a plan cell that holds
+    ground inliers. The planes are never extended beyond the ground itself.
+    """
+    ground = np.isin(labels, ground_ids)
+    if not ground.any():
+        return ~ground
+    near = np.zeros(len(points), dtype=bool)
+    for plane_model in ground_models:
+        plane_model = np.asarray(plane_model, dtype=np.float64)
+        distance = (
+            np.asarray(points, dtype=np.float64) @ plane_model[:3] + plane_model[3]
+        )
+        near |= np.abs(distance) <= clearance
+    near &= points[:, 2] - envelope <= clearance
+    near &= np.isin(keys, keys[ground])
+    return ~(ground | near)
+
+
+def cluster_points(
+    points, voxel_size=CLUSTER_VOXEL_SIZE, min_points=MIN_CLUSTER_POINTS
+):
+    """Label points by connected occupied cells; return (labels, num_clusters).
+
+    Clusters are numbered from the largest down; points of clusters below
+    min_points get -1.
+    """
+    labels = np.full(len(points), -1, dtype=np.int32)
+    if not len(points):
+        return labels, 0
+
+    # One cell of padding on every side keeps neighbour keys inside the grid
+    origin = np.asarray(points.min(axis=0), dtype=np.float64)
+    cells = np.floor((np.asarray(points, dtype=np.float64) - origin) / voxel_size)
+    cells = cells.astype(np.int64) + 1
+    dims = cells.max(axis=0) + 2
+    strides = np.array([dims[1] * dims[2], dims[2], 1])
+    keys, inverse = np.unique(cells @ strides, return_inverse=True)
+    inverse = inverse.ravel()
+    del cells
+
+    # Link every occupied cell to its occupied forward neighbours
+    sources = []
+    targets = []
+    for offset in FORWARD_OFFSETS:
+        neighbors = keys + offset @ strides
+        found = np.minimum(np.searchsorted(keys, neighbors), len(keys) - 1)
+        hit = keys[found] == neighbors
+        sources.append(np.flatnonzero(hit))
+        targets.append(found[hit])
+    sources = np.concatenate(sources)
+    graph = coo_matrix(
+        (np.ones(len(sources), dtype=np.int8), (sources, np.concatenate(targets))),
+        shape=(len(keys), len(keys)),
+    )
+    _, components = connected_components(graph, directed=False)
+
+    # Renumber the components that are big enough, largest first
+    point_components = components[inverse]
+    sizes = np.bincount(point_components)
+    kept = np.flatnonzero(sizes >= min_points)
+    kept = kept[np.argsort(-sizes[kept], kind="stable")]
+    renumber = np.full(len(sizes), -1, dtype=np.int32)
+    renumber[kept] = np.arange(len(kept))
+    labels[:] = renumber[point_components]
+    return labels, len(kept)
+
+
+def describe_clusters(points, labels, num_clusters, origin=None):
+    """Clusters in the detected_features.json schema, in world coordinates."""
+    origin = np.zeros(3) if origin is None else origin
+    clustered = np.flatnonzero(labels >= 0)
+    if not len(clustered):
+        return []
+    order = clustered[np.argsort(labels[clustered], kind="stable")]
+    world = to_world(points[order], origin)
+    starts = np.flatnonzero(np.diff(labels[order], prepend=-1))
+    counts = np.diff(np.append(starts, len(order)))
+    mins = np.minimum.reduceat(world, starts)
+    maxs = np.maximum.reduceat(world, starts)
+    centroids = np.add.reduceat(world, starts) / counts[:, np.newaxis]
+    return [
+        {
+            "cluster_id": cluster_id,
+            "bounding_box": {
+                "min": mins[cluster_id].tolist(),
+                "max": maxs[cluster_id].tolist(),
+            },
+            "num_points": int(counts[cluster_id]),
+            "centroid": centroids[cluster_id].tolist(),
+        }
+        for cluster_id in range(num_clusters)
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Deterministic voxel-grid downsampling."""
+
+import numpy as np
+
+# Points converted to voxel keys per step, bounding the temporary arrays
+KEY_CHUNK_POINTS = 4_000_000
+
+
+def voxel_keys(points, voxel_size, origin=None):
+    """Return one int64 key per point identifying its voxel, plus the grid origin."""
+    if origin is None:
+        origin = np.asarray(points.min(axis=0), dtype=np.float64)
+    extent = np.asarray(points.max(axis=0), dtype=np.float64) - origin
+    dims = np.floor(extent / voxel_size).astype(np.int64) + 1
+
+    keys = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), KEY_CHUNK_POINTS):
+        block = np.asarray(points[start : start + KEY_CHUNK_POINTS], dtype=np.float64)
+        cells = np.floor((block - origin) / voxel_size).astype(np.int64)
+        np.clip(cells, 0, dims - 1, out=cells)
+        flat = cells[:, 0] * dims[1] + cells[:, 1]
+        keys[start : start + len(block)] = flat * dims[2] + cells[:, 2]
+    return keys, origin
+
+
+def voxel_downsample(points, voxel_size, colors=None, normals=None):
+    """Average points, colors and normals per occupied voxel.
+
+    The output is ordered by voxel key, so the same input always gives the same
+    cloud, and points keep their input dtype. Returns (points, colors, normals);
+    colors and normals are None when they were not given.
+    """
+    keys, _ = voxel_keys(points, voxel_size)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    del keys
+    inverse = inverse.ravel()
+
+    def voxel_mean(values):
+        sums = [
+            np.bincount(inverse, weights=values[:, axis], minlength=len(counts))
+            for axis in range(values.shape[1])
+        ]
+        return np.stack(sums, axis=1) / counts[:, np.newaxis]
+
+    down_points = voxel_mean(points).astype(points.dtype)
+
+    down_colors = None
+    if colors is not None:
+        down_colors = np.rint(voxel_mean(colors)).astype(np.uint8)
+
+    down_normals = None
+    if normals is not None:
+        down_normals = voxel_mean(normals)
+        lengths = np.linalg.norm(down_normals, axis=1)
+        lengths[lengths == 0] = 1.0
+        down_normals /= lengths[:, np.newaxis]
+
+    return down_points, down_colors, down_normals
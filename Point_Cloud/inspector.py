@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Quick look at a PTS or LAS file without reading it: header, size and a sample.
+
+The file is memory-mapped and only small windows at evenly strided offsets are
+touched, so inspecting a multi-GB scan takes a fraction of a second. Counts,
+extents and density are estimates from those windows (LAS extents come from
+the header).
+"""
+
+import mmap
+import os
+
+import numpy as np
+
+from Point_Cloud.las_reader import las_coordinates, map_las_records, read_las_header
+from Point_Cloud.pts_reader import column_layout, parse_block, read_pts_header
+from Point_Cloud.readers import is_las
+
+# Windows sampled per file, and bytes per PTS window
+SAMPLE_WINDOWS = 256
+WINDOW_BYTES = 4096
+
+
+def pts_sample(path, windows=SAMPLE_WINDOWS):
+    """Parsed lines from windows spread over a PTS body; return (block, line bytes)."""
+    _, num_columns, data_offset = read_pts_header(path)
+    size = os.path.getsize(path)
+    blocks = []
+    sampled_bytes = 0
+    sampled_lines = 0
+    with open(path, "rb") as file:
+        view = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            last_start = max(size - WINDOW_BYTES, data_offset)
+            for start in np.linspace(data_offset, last_start, windows).astype(np.int64):
+                data = view[start : start + WINDOW_BYTES]
+                if start > data_offset:
+                    # Skip the partial line the window starts in
+                    data = data[data.find(b"\n") + 1 :]
+                data = data[: data.rfind(b"\n") + 1]
+                if not data:
+                    continue
+                sampled_bytes += len(data)
+                sampled_lines += data.count(b"\n")
+                blocks.append(parse_block(data, num_columns))
+        finally:
+            view.close()
+    block = np.vstack(blocks) if blocks else np.empty((0, num_columns))
+    line_bytes = sampled_bytes / sampled_lines if sampled_lines else 0.0
+    return block, line_bytes
+
+
+def inspect_pts(path, windows=SAMPLE_WINDOWS):
+    """Report dict of a PTS file."""
+    declared, num_columns, data_offset = read_pts_header(path)
+    block, line_bytes = pts_sample(path, windows)
+    body_bytes = os.path.getsize(path) - data_offset
+    intensity_column, rgb_columns = column_layout(num_columns)
+    report = {
+        "format": "PTS",
+        "columns": num_columns,
+        "declared_points": declared,
+        "estimated_points": int(round(body_bytes / line_bytes)) if line_bytes else 0,
+        "sampled_points": len(block),
+        "has_color": rgb_columns is not None,
+        "has_intensity": intensity_column is not None,
+    }
+    report.update(extent(block[:, :3]))
+    return report
+
+
+def inspect_las(path, windows=SAMPLE_WINDOWS):
+    """Report dict of a LAS file; the extent is the header's bounding box."""
+    header = read_las_header(path)
+    records = map_las_records(path, header)
+    stored = max(os.path.getsize(path) - header.point_offset, 0)
+    sample = (
+        records[np.unique(np.linspace(0, len(records) - 1, windows).astype(np.int64))]
+        if len(records)
+        else records
+    )
+    report = {
+        "format": "LAS {}.{} (point format {})".format(
+            header.version[0], header.version[1], header.point_format
+        ),
+        "declared_points": header.num_points,
+        "estimated_points": stored // header.record_length,
+        "sampled_points": len(sample),
+        "has_color": header.has_color,
+        "has_intensity": bool(len(sample) and sample["intensity"].any()),
+    }
+    report.update(extent(las_coordinates(sample, header)))
+    if header.num_points:
+        report["bbox_min"] = header.mins.tolist()
+        report["bbox_max"] = header.maxs.tolist()
+    return report
+
+
+def extent(points):
+    """Approximate bounding box of sampled points."""
+    if not len(points):
+        return {"bbox_min": None, "bbox_max": None}
+    return {
+        "bbox_min": points.min(axis=0).tolist(),
+        "bbox_max": points.max(axis=0).tolist(),
+    }
+
+
+def add_density(report):
+    """Add points per square meter of the XY extent and the matching mean spacing."""
+    report["points_per_m2"] = None
+    report["mean_spacing"] = None
+    if report["bbox_min"] is None:
+        return report
+    size = np.subtract(report["bbox_max"], report["bbox_min"])
+    area = size[0] * size[1]
+    count = report["estimated_points"] or report["declared_points"]
+    if area > 0 and count:
+        report["points_per_m2"] = count / area
+        report["mean_spacing"] = float(np.sqrt(area / count))
+    return report
+
+
+def inspect_point_cloud(path, windows=SAMPLE_WINDOWS):
+    """Header facts and sampled estimates of a PTS or LAS file, as a dict."""
+    if is_las(path):
+        report = inspect_las(path, windows)
+    else:
+        report = inspect_pts(path, windows)
+    report["path"] = path
+    report["file_bytes"] = os.path.getsize(path)
+    return add_density(report)
+
+
+def format_report(report):
+    """Human-readable lines of an inspection report."""
+
+    def xyz(values):
+        return "({:.3f}, {:.3f}, {:.3f})".format(*values)
+
+    lines = [
+        report["path"],
+        "  Format:            " + report["format"],
+        "  File size:         {:.1f} MB".format(report["file_bytes"] / 1e6),
+        "  Declared points:   {}".format(report["declared_points"]),
+        "  Estimated points:  {} (from file size)".format(report["estimated_points"]),
+        "  Color:             " + ("yes" if report["has_color"] else "no"),
+        "  Intensity:         " + ("yes" if report["has_intensity"] else "no"),
+    ]
+    if report["bbox_min"] is not None:
+        lines.append(
+            "  Bounding box:      {} - {}".format(
+                xyz(report["bbox_min"]), xyz(report["bbox_max"])
+            )
+        )
+    if report["points_per_m2"] is not None:
+        lines.append(
+            "  Density:           {:.1f} points/m2 (mean spacing {:.3f} m)".format(
+                report["points_per_m2"], report["mean_spacing"]
+            )
+        )
+    lines.append("  Sampled points:    {}".format(report["sampled_points"]))
+    return "\n".join(lines)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Memory-mapped reader for uncompressed LAS 1.2-1.4, point formats 0-3 and 6-8.
+
+Point records are viewed as a structured dtype over np.memmap, and integer
+coordinates are scaled and offset in vectorized blocks. Blocks come out in
+the PTS column layout (x y z intensity [r g b]), so the tiling and ingest
+code that consumes PTS blocks takes LAS unchanged. The uint16 LAS intensity
+is halved to fit the int16 intensity column without clipping.
+"""
+
+import struct
+
+import numpy as np
+
+from Point_Cloud.pts_reader import (
+    COLOR_DTYPE,
+    INTENSITY_DTYPE,
+    POINT_DTYPE,
+    PointCloudData,
+    choose_origin,
+)
+from Point_Cloud.revit_transform import transform_points
+
+# Records converted per block, bounding the float64 temporaries
+DEFAULT_CHUNK_POINTS = 2_000_000
+# Records sampled to decide whether RGB uses 8 or 16 bits
+COLOR_SAMPLE_POINTS = 100_000
+# Right shift that maps uint16 LAS intensity onto the int16 intensity column
+INTENSITY_SHIFT = 1
+
+_XYZ = [("X", "<i4"), ("Y", "<i4"), ("Z", "<i4"), ("intensity", "<u2")]
+_RGB = [("red", "<u2"), ("green", "<u2"), ("blue", "<u2")]
+_LEGACY = _XYZ + [
+    ("return_bits", "u1"),
+    ("classification", "u1"),
+    ("scan_angle_rank", "i1"),
+    ("user_data", "u1"),
+    ("point_source_id", "<u2"),
+]
+_EXTENDED = _XYZ + [
+    ("return_bits", "u1"),
+    ("flags", "u1"),
+    ("classification", "u1"),
+    ("user_data", "u1"),
+    ("scan_angle", "<i2"),
+    ("point_source_id", "<u2"),
+    ("gps_time", "<f8"),
+]
+POINT_FORMATS = {
+    0: _LEGACY,
+    1: _LEGACY + [("gps_time", "<f8")],
+    2: _LEGACY + _RGB,
+    3: _LEGACY + [("gps_time", "<f8")] + _RGB,
+    6: _EXTENDED,
+    7: _EXTENDED + _RGB,
+    8: _EXTENDED + _RGB + [("nir", "<u2")],
+}
+
+
+class LasHeader(object):
+    """The fields of a LAS public header block needed to read the points."""
+
+    def __init__(self, data):
+        if data[:4] != b"LASF":
+            raise ValueError("Not a LAS file (missing LASF signature).")
+        self.version = (data[24], data[25])
+        self.point_offset = struct.unpack_from("<I", data, 96)[0]
+        point_format = data[104]
+        if point_format & 0xC0:
+            raise ValueError("Compressed (LAZ) point records are not supported.")
+        self.point_format = point_format
+        self.record_length = struct.unpack_from("<H", data, 105)[0]
+        self.num_points = struct.unpack_from("<I", data, 107)[0]
+        self.scale = np.array(struct.unpack_from("<3d", data, 131))
+        self.offset = np.array(struct.unpack_from("<3d", data, 155))
+        max_x, min_x, max_y, min_y, max_z, min_z = struct.unpack_from("<6d", data, 179)
+        self.mins = np.array([min_x, min_y, min_z])
+        self.maxs = np.array([max_x, max_y, max_z])
+        if self.version >= (1, 4) and len(data) >= 255:
+            # LAS 1.4 keeps the 64-bit count here; the legacy field may be 0
+            self.num_points = struct.unpack_from("<Q", data, 247)[0] or self.num_points
+        if point_format not in POINT_FORMATS:
+            raise ValueError(
+                "LAS point format {} is not supported.".format(point_format)
+            )
+
+    @property
+    def has_color(self):
+        """True for the point formats that carry RGB."""
+        return self.point_format in (2, 3, 7, 8)
+
+    def record_dtype(self):
+        """Structured dtype of one point record, padded to the record length."""
+        fields = POINT_FORMATS[self.point_format]
+        base = np.dtype(fields)
+        if self.record_length < base.itemsize:
+            raise ValueError(
+                "LAS record length {} is shorter than point format {}.".format(
+                    self.record_length, self.point_format
+                )
+            )
+        # Extra bytes after the standard fields are skipped
+        return np.dtype(
+            {
+                "names": base.names,
+                "formats": [base.fields[name][0] for name in base.names],
+                "offsets": [base.fields[name][1] for name in base.names],
+                "itemsize": self.record_length,
+            }
+        )
+
+
+def read_las_header(path):
+    """Parse the public header block of a LAS file."""
+    with open(path, "rb") as file:
+        data = file.read(375)
+    return LasHeader(data)
+
+
+def map_las_records(path, header=None):
+    """Read-only structured np.memmap over all point records of path."""
+    header = header or read_las_header(path)
+    if not header.num_points:
+        return np.empty(0, dtype=header.record_dtype())
+    return np.memmap(
+        path,
+        dtype=header.record_dtype(),
+        mode="r",
+        offset=header.point_offset,
+        shape=(header.num_points,),
+    )
+
+
+def color_shift(records):
+    """Bit shift that maps the file's RGB to 0-255: 8 for 16-bit color, else 0."""
+    step = max(len(records) // COLOR_SAMPLE_POINTS, 1)
+    sample = records[::step]
+    peak = max(
+        int(sample[channel].max(initial=0)) for channel in ("red", "green", "blue")
+    )
+    return 8 if peak > 255 else 0
+
+
+def las_coordinates(records, header):
+    """float64 world coordinates of a block of records."""
+    xyz = np.empty((len(records), 3), dtype=np.float64)
+    for axis, name in enumerate(("X", "Y", "Z")):
+        xyz[:, axis] = records[name] * header.scale[axis] + header.offset[axis]
+    return xyz
+
+
+def iter_las_chunks(path, chunk_points=DEFAULT_CHUNK_POINTS):
+    """Yield (N, 4 or 7) float64 blocks in the PTS layout x y z intensity [r g b]."""
+    header = read_las_header(path)
+    records = map_las_records(path, header)
+    shift = color_shift(records) if header.has_color else 0
+    for start in range(0, len(records), chunk_points):
+        block = records[start : start + chunk_points]
+        columns = [
+            las_coordinates(block, header),
+            (block["intensity"] >> INTENSITY_SHIFT)[:, np.newaxis],
+        ]
+        if header.has_color:
+            columns.append(
+                np.stack(
+                    [
+                        np.minimum(block[channel] >> shift, 255)
+                        for channel in ("red", "green", "blue")
+                    ],
+                    axis=1,
+                )
+            )
+        yield np.hstack(columns).astype(np.float64)
+
+
+def read_las(path, chunk_points=DEFAULT_CHUNK_POINTS, transform=None):
+    """Read a LAS file straight into the compact PointCloudData columns.
+
+    transform is an optional 4x4 matrix applied to every block as it is read.
+    """
+    header = read_las_header(path)
+    records = map_las_records(path, header)
+    num_points = len(records)
+    corner = header.mins[np.newaxis]
+    if transform is not None:
+        corner = transform_points(corner, transform)
+    origin = choose_origin(corner) if num_points else np.zeros(3)
+
+    points = np.empty((num_points, 3), dtype=POINT_DTYPE)
+    intensity = np.empty(num_points, dtype=INTENSITY_DTYPE)
+    colors = np.empty((num_points, 3), dtype=COLOR_DTYPE) if header.has_color else None
+    shift = color_shift(records) if header.has_color else 0
+
+    for start in range(0, num_points, chunk_points):
+        block = records[start : start + chunk_points]
+        end = start + len(block)
+        xyz = las_coordinates(block, header)
+        if transform is not None:
+            xyz = transform_points(xyz, transform)
+        points[start:end] = xyz - origin
+        intensity[start:end] = block["intensity"] >> INTENSITY_SHIFT
+        if colors is not None:
+            for axis, channel in enumerate(("red", "green", "blue")):
+                colors[start:end, axis] = np.minimum(block[channel] >> shift, 255)
+
+    return PointCloudData(points, colors, intensity, origin)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Floor levels from a weighted height histogram of points on horizontal surfaces.
+
+Points whose normal is close to vertical are binned by height. Every point
+is weighted by its share of the horizontal area it covers: its (x, y,
+height bin) cell is counted once, whatever the local point density. The
+histogram then holds horizontal area per height, and floors, flat roofs and
+the ground show up as its peaks.
+"""
+
+import numpy as np
+
+# Points whose normal is within this angle of vertical lie on a horizontal surface
+HORIZONTAL_ANGLE_DEG = 10.0
+# Height bin of the histogram in meters
+LEVEL_BIN_SIZE = 0.05
+# Plan cell in meters over which horizontal area is counted
+LEVEL_CELL_SIZE = 0.25
+# Peaks with less horizontal area than this (square meters) are not levels
+MIN_LEVEL_AREA = 10.0
+# Peaks closer than this (meters) to a larger one belong to the same level
+LEVEL_SEPARATION = 2.0
+# Levels need at least this share of interior plan cells (all 8 neighbours set)
+MIN_CORE_FRACTION = 0.5
+# Interior cells are counted on cells this many times the plan cell, so that
+# sparse floors have no gaps
+CORE_CELL_FACTOR = 2
+
+_NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+
+def horizontal_mask(normals_z, max_angle=HORIZONTAL_ANGLE_DEG):
+    """Mask of points whose normal is within max_angle of vertical."""
+    return np.abs(normals_z) >= np.cos(np.radians(max_angle))
+
+
+def labelled_normals_z(labels, plane_models):
+    """Z component of the normal of every point's plane; 0 for unlabelled points."""
+    normals_z = np.zeros(len(labels))
+    if len(plane_models):
+        plane_models = np.asarray(plane_models, dtype=np.float64)
+        plane_z = plane_models[:, 2] / np.linalg.norm(plane_models[:, :3], axis=1)
+        labelled = labels >= 0
+        normals_z[labelled] = plane_z[labels[labelled]]
+    return normals_z
+
+
+def height_histogram(points, bin_size=LEVEL_BIN_SIZE, cell_size=LEVEL_CELL_SIZE):
+    """Horizontal area and area-weighted height sum per height bin, bottom up."""
+    bins = np.floor(points[:, 2] / bin_size).astype(np.int64)
+    cells = np.floor(points[:, :2] / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    bins -= bins.min()
+    width, height = cells.max(axis=0) + 1
+
+    # Points per (x, y, height) cell, so that each cell adds one cell of area
+    keys = (bins * width + cells[:, 0]) * height + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+    counts = np.diff(np.append(starts, len(keys)))
+    weights = np.empty(len(keys))
+    weights[order] = np.repeat(cell_size**2 / counts, counts)
+
+    areas = np.bincount(bins, weights=weights)
+    height_sums = np.bincount(bins, weights=weights * points[:, 2])
+    return areas, height_sums
+
+
+def find_levels(
+    points,
+    bin_size=LEVEL_BIN_SIZE,
+    cell_size=LEVEL_CELL_SIZE,
+    min_area=MIN_LEVEL_AREA,
+    separation=LEVEL_SEPARATION,
+    min_core_fraction=MIN_CORE_FRACTION,
+):
+    """Candidate levels of horizontal points as (elevation, area) pairs, bottom up.
+
+    Peaks are local maxima of the area in a three-bin window; the largest
+    peak within separation of others wins. Areas are those of the plan cells
+    occupied within the peak's window. Peaks made of thin strips, such as
+    the ridges of gabled roofs, are dropped by min_core_fraction.
+    """
+    if not len(points):
+        return []
+    points = np.asarray(points, dtype=np.float64)
+    areas, height_sums = height_histogram(points, bin_size, cell_size)
+    padded = np.concatenate([[0.0], areas, [0.0]])
+    windows = padded[:-2] + padded[1:-1] + padded[2:]
+    sums = np.concatenate([[0.0], height_sums, [0.0]])
+    height_windows = sums[:-2] + sums[1:-1] + sums[2:]
+
+    padded_windows = np.concatenate([[-1.0], windows, [-1.0]])
+    peaks = np.flatnonzero(
+        (windows >= padded_windows[:-2])
+        & (windows > padded_windows[2:])
+        & (windows >= min_area)
+    )
+    elevations = height_windows[peaks] / windows[peaks]
+
+    # The window can count a cell twice at a bin edge; measure the kept levels
+    kept = []
+    for peak in np.argsort(-windows[peaks], kind="stable"):
+        if all(
+            abs(elevations[peak] - elevations[other]) >= separation for other in kept
+        ):
+            kept.append(peak)
+    levels = []
+    for peak in sorted(kept, key=lambda peak: elevations[peak]):
+        near = np.abs(points[:, 2] - elevations[peak]) <= 1.5 * bin_size
+        area = plan_area(points[near], cell_size)
+        keys, height = plan_cells(points[near], CORE_CELL_FACTOR * cell_size)
+        if area >= min_area and core_fraction(keys, height) >= min_core_fraction:
+            levels.append((float(elevations[peak]), area))
+    return levels
+
+
+def plan_cells(points, cell_size=LEVEL_CELL_SIZE):
+    """Sorted keys of the plan cells holding points, and the key stride of a column.
+
+    A border of empty cells on every side keeps neighbour keys unambiguous.
+    """
+    if not len(points):
+        return np.empty(0, dtype=np.int64), 1
+    cells = np.floor(np.asarray(points)[:, :2] / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    height = cells[:, 1].max() + 2
+    keys = np.sort(cells[:, 0] * height + cells[:, 1])
+    return keys[np.flatnonzero(np.diff(keys, prepend=-1))], height
+
+
+def plan_area(points, cell_size=LEVEL_CELL_SIZE):
+    """Area of the plan cells that hold at least one point."""
+    keys, _ = plan_cells(points, cell_size)
+    return float(len(keys)) * cell_size**2
+
+
+def core_fraction(keys, height):
+    """Share of the occupied cells whose 8 neighbours are all occupied too.
+
+    keys and height come from plan_cells. Floors and flat roofs are mostly
+    interior cells; a strip one or two cells wide has none.
+    """
+    if not len(keys):
+        return 0.0
+    interior = np.ones(len(keys), dtype=bool)
+    for dx, dy in _NEIGHBOURS:
+        neighbour = keys + dx * height + dy
+        found = np.minimum(np.searchsorted(keys, neighbour), len(keys) - 1)
+        interior &= keys[found] == neighbour
+    return float(np.count_nonzero(interior)) / len(keys)
+
+
+def describe_levels(levels, origin=None):
+    """Levels in the detected_surfaces.json schema, with world elevations."""
+    origin = np.zeros(3) if origin is None else origin
+    return [
+        {
+            "level_id": level_id,
+            "elevation": elevation + float(origin[2]),
+            "area": area,
+        }
+        for level_id, (elevation, area) in enumerate(levels)
+    ]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Per-stage wall time, CPU time, peak memory and throughput for metrics.json."""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # Optional: the standard library fallbacks below suffice
+    psutil = None
+
+METRICS_VERSION = 1
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes, or None if unavailable."""
+    if sys.platform != "win32":
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    if psutil is not None:
+        return getattr(psutil.Process().memory_info(), "peak_wset", None)
+    return _windows_peak_working_set()
+
+
+def _windows_peak_working_set():
+    """Peak working set through GetProcessMemoryInfo, without psutil."""
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(
+        process, ctypes.byref(counters), counters.cb
+    ):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+class MetricsRecorder(object):
+    """Collects stage timings and RANSAC rounds for one pipeline run."""
+
+    def __init__(self):
+        self.stages = []
+        self.ransac_rounds = []
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+
+    @contextmanager
+    def stage(self, name, num_points=None):
+        """Time the enclosed block; the yielded dict may be updated, e.g. points."""
+        entry = {"name": name, "points": num_points}
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield entry
+        finally:
+            entry["wall_seconds"] = time.perf_counter() - wall
+            entry["cpu_seconds"] = time.process_time() - cpu
+            entry["peak_rss_bytes"] = peak_rss_bytes()
+            if entry["points"] and entry["wall_seconds"] > 0:
+                entry["points_per_second"] = entry["points"] / entry["wall_seconds"]
+            self.stages.append(entry)
+
+    def summary(self, extra=None):
+        """The metrics.json document."""
+        document = {
+            "version": METRICS_VERSION,
+            "pid": os.getpid(),
+            "total": {
+                "wall_seconds": time.perf_counter() - self.started,
+                "cpu_seconds": time.process_time() - self.cpu_started,
+                "peak_rss_bytes": peak_rss_bytes(),
+            },
+            "stages": self.stages,
+            "ransac_rounds": self.ransac_rounds,
+        }
+        document.update(extra or {})
+        return document
+
+    def write(self, path, extra=None):
+        """Write the metrics document as JSON."""
+        with open(path, "w") as file:
+            json.dump(self.summary(extra), file, indent=4)
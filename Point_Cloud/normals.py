@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Normal estimation over XY tiles in a process pool, written into the point cloud cache.
+
+Each worker memory-maps the cached points, estimates normals for one tile's
+core points plus a halo one search radius wide, and writes the core rows
+straight into the cached normals column. With the halo every core point sees
+the same neighbourhood as in a single global estimate.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Point_Cloud.plane_detection import estimate_normals
+from Point_Cloud.tiling import tile_memberships
+
+# XY tile edge in meters; large enough that the halo stays a small overhead
+NORMAL_TILE_SIZE = 20.0
+
+
+def normal_tiles(points, tile_size, halo):
+    """(core indices, halo indices) of every occupied XY tile, in tile order."""
+    members = {}
+    for cells, mask, is_core in tile_memberships(points[:, :2], tile_size, halo):
+        indices = np.flatnonzero(mask)
+        if not len(indices):
+            continue
+        keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(indices[order], np.cumsum(np.bincount(inverse))[:-1])
+        for key, group in zip(map(tuple, keys), groups):
+            members.setdefault(key, ([], []))[0 if is_core else 1].append(group)
+
+    tiles = []
+    for key in sorted(members):
+        core, halo_parts = members[key]
+        if core:
+            tiles.append(
+                (
+                    np.concatenate(core),
+                    np.concatenate(halo_parts or [np.empty(0, dtype=np.int64)]),
+                )
+            )
+    return tiles
+
+
+def _estimate_tile(points_path, normals_path, core, halo, radius, max_nn):
+    """Worker: estimate one tile's normals and write its core rows to normals_path."""
+    points = np.load(points_path, mmap_mode="r")
+    pcd = estimate_normals(points[np.concatenate([core, halo])], radius, max_nn)
+    normals = np.load(normals_path, mmap_mode="r+")
+    normals[core] = np.asarray(pcd.normals)[: len(core)]
+    normals.flush()
+    return len(core)
+
+
+def estimate_normals_tiled(
+    points_path, normals_path, radius, max_nn, workers, tile_size=NORMAL_TILE_SIZE
+):
+    """Fill the .npy at normals_path with normals of the .npy points at points_path."""
+    points = np.load(points_path, mmap_mode="r")
+    tiles = normal_tiles(points, max(tile_size, 2 * radius), radius)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _estimate_tile, points_path, normals_path, core, halo, radius, max_nn
+            )
+            for core, halo in tiles
+        ]
+        for future in futures:
+            future.result()
+    return len(tiles)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Multi-process PTS ingestion over newline-aligned byte ranges.
+
+Workers parse their own byte range and write straight into the cache's
+preallocated .npy columns through np.memmap, so no point data is pickled back
+to the parent process.
+"""
+
+import os
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Point_Cloud.pts_reader import (
+    COLOR_DTYPE,
+    DEFAULT_CHUNK_BYTES,
+    INTENSITY_DTYPE,
+    POINT_DTYPE,
+    choose_origin,
+    column_layout,
+    iter_pts_chunks,
+    read_pts_header,
+    store_block,
+)
+from Point_Cloud.revit_transform import transform_block
+
+# Ranges per worker; a few more than one evens out lines of different length
+RANGES_PER_WORKER = 4
+# Bytes parsed up front to pick the shared origin of the local coordinates
+ORIGIN_SAMPLE_BYTES = 1024 * 1024
+
+
+def split_byte_ranges(path, data_offset, num_ranges):
+    """Split the PTS body into (start, end) byte ranges that begin on a new line."""
+    size = os.path.getsize(path)
+    bounds = [data_offset]
+    with open(path, "rb") as file:
+        for index in range(1, num_ranges):
+            target = data_offset + (size - data_offset) * index // num_ranges
+            if target <= bounds[-1]:
+                continue
+            # Move forward to the first byte after the next newline
+            file.seek(target - 1)
+            file.readline()
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def count_lines(path, start, end, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Count the lines in a byte range, including an unterminated last line."""
+    count = 0
+    last_byte = b"\n"
+    with open(path, "rb") as file:
+        file.seek(start)
+        position = start
+        while position < end:
+            block = file.read(min(chunk_bytes, end - position))
+            if not block:
+                break
+            position += len(block)
+            count += block.count(b"\n")
+            last_byte = block[-1:]
+    return count + (0 if last_byte == b"\n" else 1)
+
+
+def _parse_range(path, start, end, row, column_paths, origin, chunk_bytes, transform):
+    """Worker: parse one byte range into the shared columns from row onwards."""
+    columns = {
+        name: np.load(column_path, mmap_mode="r+")
+        for name, column_path in column_paths.items()
+    }
+    first_row = row
+    for block in iter_pts_chunks(path, chunk_bytes, start, end):
+        row = store_block(
+            transform_block(block, transform),
+            row,
+            columns["points"],
+            columns.get("colors"),
+            columns.get("intensity"),
+            origin,
+        )
+    for column in columns.values():
+        column.flush()
+    return row - first_row
+
+
+def ingest_pts_parallel(
+    path, cache, workers, chunk_bytes=DEFAULT_CHUNK_BYTES, transform=None
+):
+    """Parse path with a pool of workers into cache columns; return the point count.
+
+    transform is an optional 4x4 matrix applied to every block as it is parsed.
+    """
+    _, num_columns, data_offset = read_pts_header(path)
+    intensity_column, rgb_columns = column_layout(num_columns)
+    ranges = split_byte_ranges(path, data_offset, workers * RANGES_PER_WORKER)
+    # Every worker stores coordinates relative to the same origin
+    with closing(iter_pts_chunks(path, ORIGIN_SAMPLE_BYTES)) as chunks:
+        first_block = next(chunks, np.empty((0, 3)))
+    origin = choose_origin(transform_block(first_block, transform)[:, :3])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Pass 1: line counts give every range its first output row
+        counts = list(
+            executor.map(
+                count_lines,
+                [path] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges],
+            )
+        )
+        first_rows = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        capacity = int(first_rows[-1])
+
+        # Pass 2: preallocate the shared columns and let workers fill them
+        shapes = {"points": ((capacity, 3), POINT_DTYPE)}
+        if rgb_columns:
+            shapes["colors"] = ((capacity, 3), COLOR_DTYPE)
+        if intensity_column is not None:
+            shapes["intensity"] = ((capacity,), INTENSITY_DTYPE)
+
+        cache.invalidate()
+        column_paths = {}
+        for name, (shape, dtype) in shapes.items():
+            column = cache.create_column(name, shape, dtype)
+            del column  # Release the parent's map; workers reopen the file
+            column_paths[name] = cache.column_path(name)
+
+        futures = [
+            executor.submit(
+                _parse_range,
+                path,
+                start,
+                end,
+                int(first_rows[index]),
+                column_paths,
+                origin,
+                chunk_bytes,
+                transform,
+            )
+            for index, (start, end) in enumerate(ranges)
+        ]
+        parsed = [future.result() for future in futures]
+
+    num_points = capacity
+    if sum(parsed) != capacity:
+        # Blank or malformed lines were skipped: close the gaps they left behind
+        num_points = _compact_columns(column_paths, first_rows, parsed)
+
+    cache.write_manifest(
+        {
+            name: {
+                "dtype": np.dtype(dtype).name,
+                "shape": [num_points] + list(shape[1:]),
+            }
+            for name, (shape, dtype) in shapes.items()
+        },
+        num_points,
+        origin,
+    )
+    return num_points
+
+
+def _compact_columns(column_paths, first_rows, parsed):
+    """Shift parsed rows down over unused slots and rewrite the columns at size."""
+    num_points = int(sum(parsed))
+    for name, column_path in column_paths.items():
+        column = np.load(column_path, mmap_mode="r+")
+        row = 0
+        for first_row, count in zip(first_rows[:-1], parsed):
+            column[row : row + count] = column[first_row : first_row + count]
+            row += count
+        compacted = np.array(column[:num_points])
+        del column
+        np.save(column_path, compacted)
+    return num_points
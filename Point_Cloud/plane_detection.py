@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Normal estimation and sequential RANSAC plane detection."""
+
+import time
+
+import numpy as np
+import open3d as o3d
+
+from Point_Cloud.pts_reader import plane_to_world, to_world
+from Point_Cloud.ransac import DEFAULT_CONFIDENCE, fit_plane_ransac
+from Point_Cloud.region_growing import grow_planar_regions
+
+# Defaults of the original analysis script
+NORMAL_RADIUS = 0.5
+NORMAL_MAX_NN = 30
+DISTANCE_THRESHOLD = 0.05
+NUM_ITERATIONS = 1000
+MIN_PLANE_POINTS = 5000
+MIN_REMAINING_POINTS = 1000
+
+# NumPy estimator: compact the residual once fewer than this fraction of it is live
+COMPACT_FRACTION = 0.5
+
+
+def estimate_normals(points, radius=NORMAL_RADIUS, max_nn=NORMAL_MAX_NN, normals=None):
+    """Build an Open3D cloud from points and estimate its normals (unless given)."""
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(np.array(points, dtype=np.float64))
+    if normals is not None:
+        pcd.normals = o3d.utility.Vector3dVector(np.array(normals, dtype=np.float64))
+        return pcd
+    pcd.estimate_normals(
+        search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=radius, max_nn=max_nn)
+    )
+    return pcd
+
+
+def classify_plane(normal):
+    """Label a plane Ground, Wall or Roof from its normal."""
+    if abs(normal[2]) > 0.9:  # Z-axis normal → Ground
+        return "Ground"
+    if abs(normal[2]) < 0.2:  # Mostly vertical → Wall
+        return "Wall"
+    return "Roof"  # Slanted surface → Roof
+
+
+def detect_planes(
+    pcd,
+    distance_threshold=DISTANCE_THRESHOLD,
+    num_iterations=NUM_ITERATIONS,
+    min_plane_points=MIN_PLANE_POINTS,
+    min_remaining_points=MIN_REMAINING_POINTS,
+    compact_fraction=COMPACT_FRACTION,
+    method="numpy",
+    confidence=DEFAULT_CONFIDENCE,
+    seed=0,
+    log=print,
+    rounds=None,
+):
+    """Run sequential RANSAC on pcd with our own NumPy estimator or Open3D's.
+
+    A working_index array maps the residual points back to input indices.
+    The NumPy estimator samples live rows only: each plane's inliers are
+    overwritten with NaN in place, and the buffer is compacted once the live
+    fraction falls below compact_fraction. Open3D's segment_plane samples
+    and counts every row, so its residual must be rebuilt after each plane;
+    it holds the points only, without normals or colors. Returns (planes, labels): planes is a list of
+    (plane_model, indices, info) and labels gives the plane of every input
+    point (-1 = none), both in the indices of the pcd that was passed in.
+    When rounds is a list, one timing record per RANSAC pass is appended.
+    """
+    planes = []
+    labels = np.full(len(pcd.points), -1, dtype=np.int32)
+    working_index = np.arange(len(labels))  # Working position → input index
+    num_alive = len(labels)
+
+    # Fixed RANSAC seed so repeated runs on the same scan agree
+    if method == "numpy":
+        rng = np.random.default_rng(seed)
+        working = np.array(pcd.points, dtype=np.float64)
+    else:
+        o3d.utility.random.seed(seed)
+        working = o3d.geometry.PointCloud(pcd.points)
+
+    while num_alive > min_remaining_points:  # Stop if too few points remain
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if method == "numpy":
+            plane_model, inliers, info = fit_plane_ransac(
+                working, distance_threshold, confidence, num_iterations, rng
+            )
+        else:
+            plane_model, inliers = working.segment_plane(
+                distance_threshold=distance_threshold,
+                ransac_n=3,
+                num_iterations=num_iterations,
+            )
+            info = {"iterations": num_iterations}
+
+        if rounds is not None:
+            rounds.append(
+                {
+                    "method": method,
+                    "live_points": num_alive,
+                    "iterations": info["iterations"],
+                    "inliers": len(inliers),
+                    "wall_seconds": time.perf_counter() - wall,
+                    "cpu_seconds": time.process_time() - cpu,
+                }
+            )
+
+        if len(inliers) < min_plane_points:  # Ignore small planes
+            log("Skipped small plane with " + str(len(inliers)) + " points.")
+            break
+
+        inliers = np.asarray(inliers, dtype=np.int64)
+        indices = working_index[inliers]
+        labels[indices] = len(planes)
+        planes.append((np.asarray(plane_model, dtype=np.float64), indices, info))
+
+        num_alive -= len(inliers)
+        if method == "numpy":
+            # Retire the inliers in place; compact once dead rows dominate
+            working[inliers] = np.nan
+            if num_alive < compact_fraction * len(working_index):
+                alive = np.flatnonzero(labels[working_index] < 0)
+                working = working[alive]
+                working_index = working_index[alive]
+        else:
+            # Dead rows would be sampled and counted again: keep live points only
+            working = working.select_by_index(inliers, invert=True)
+            working_index = np.delete(working_index, inliers)
+
+    return planes, labels
+
+
+def run_plane_engine(pcd, params, log=print, rounds=None):
+    """Detect planes in pcd with the engine and settings named in params."""
+    if params["engine"] == "region-growing":
+        return grow_planar_regions(
+            np.asarray(pcd.points),
+            np.asarray(pcd.normals),
+            params["normal_radius"],
+            params["distance_threshold"],
+            params["min_plane_points"],
+            log=log,
+        )
+    return detect_planes(
+        pcd,
+        distance_threshold=params["distance_threshold"],
+        num_iterations=params["num_iterations"],
+        min_plane_points=params["min_plane_points"],
+        method=params["ransac"],
+        confidence=params["confidence"],
+        seed=params["seed"],
+        log=log,
+        rounds=rounds,
+    )
+
+
+def describe_plane(points, plane_model, indices, plane_id, info=None, origin=None):
+    """Summarize a detected plane in the detected_surfaces.json schema.
+
+    points and plane_model are local to origin; the summary is in world
+    coordinates. The engine's info (RANSAC iterations or the region-growing
+    engine name) is kept under "detection".
+    """
+    origin = np.zeros(3) if origin is None else origin
+    plane_points = to_world(points[indices], origin)
+    plane_model = plane_to_world(plane_model, origin)
+    surface = {
+        "type": classify_plane(plane_model[:3]),
+        "plane_id": plane_id,
+        "bounding_box": {
+            "min": plane_points.min(axis=0).tolist(),
+            "max": plane_points.max(axis=0).tolist(),
+        },
+        "num_points": len(plane_points),
+        "plane_model": [float(value) for value in plane_model],
+        "centroid": plane_points.mean(axis=0).tolist(),
+    }
+    if info:
+        surface["detection"] = info
+    return surface
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""Batch geometry of detected planes: oriented boxes, raster areas and outlines.
+
+All planes are handled together from the per-point plane labels. Points are
+grouped by label once and projected into each plane's own 2D frame (centroid,
+principal in-plane axis, normal). Areas and outlines then come from a single
+occupancy grid keyed by (plane, column, row), traced and simplified for every
+plane at the same time. Only the convex hull behind each oriented box is
+computed per plane.
+"""
+
+import numpy as np
+from scipy.spatial import ConvexHull
+
+from Point_Cloud.pts_reader import to_world
+
+# Smallest occupancy grid cell in meters for areas and outlines
+AREA_CELL_SIZE = 0.1
+# Sparse planes get cells this many point spacings wide, so few cells are empty
+CELL_SPACINGS = 2.0
+# Outline vertices deviating less than this many cells are simplified away
+SIMPLIFY_CELLS = 1.5
+
+# Boundary edge directions on the grid, counter-clockwise: +x, +y, -x, -y
+_STEPS = np.array([(1, 0), (0, 1), (-1, 0), (0, -1)])
+
+
+def group_by_label(labels):
+    """Point indices sorted by plane label; return (order, plane starts, counts)."""
+    selected = np.flatnonzero(labels >= 0)
+    order = selected[np.argsort(labels[selected], kind="stable")]
+    counts = np.bincount(labels[order])
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return order, starts, counts
+
+
+def plane_frames(points, order, starts, counts, plane_models):
+    """Per-plane centroid and in-plane axes u, v, plus the 2D coordinates of points.
+
+    u is the principal in-plane direction of each plane's points and v
+    completes a right-handed frame with the plane normal.
+    """
+    gathered = np.asarray(points[order], dtype=np.float64)
+    centroids = np.add.reduceat(gathered, starts) / counts[:, np.newaxis]
+    gathered -= np.repeat(centroids, counts, axis=0)
+
+    # Covariance per plane, one reduceat per matrix entry
+    covariance = np.empty((len(counts), 3, 3))
+    for row in range(3):
+        for column in range(row, 3):
+            sums = np.add.reduceat(gathered[:, row] * gathered[:, column], starts)
+            covariance[:, row, column] = covariance[:, column, row] = sums / counts
+
+    normals = np.asarray(plane_models, dtype=np.float64)[:, :3]
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    projector = np.eye(3) - normals[:, :, np.newaxis] * normals[:, np.newaxis, :]
+    _, vectors = np.linalg.eigh(projector @ covariance @ projector)
+    u_axes = vectors[:, :, 2]
+    u_axes -= np.einsum("ij,ij->i", u_axes, normals)[:, np.newaxis] * normals
+    u_axes /= np.linalg.norm(u_axes, axis=1)[:, np.newaxis]
+    v_axes = np.cross(normals, u_axes)
+
+    coords = np.stack(
+        [
+            np.einsum("ij,ij->i", gathered, np.repeat(u_axes, counts, axis=0)),
+            np.einsum("ij,ij->i", gathered, np.repeat(v_axes, counts, axis=0)),
+        ],
+        axis=1,
+    )
+    return centroids, u_axes, v_axes, coords
+
+
+def min_area_rectangle(coords):
+    """Minimum-area rectangle of 2D points by rotating calipers over the hull edges.
+
+    Returns (center, axis, size): size is (length, width) with length along
+    the unit vector axis.
+    """
+    try:
+        hull = coords[ConvexHull(coords).vertices]
+    except (RuntimeError, ValueError):
+        # Too few or collinear points: the extreme points span the extent
+        hull = coords[np.unique(np.concatenate([coords.argmin(0), coords.argmax(0)]))]
+    edges = np.roll(hull, -1, axis=0) - hull
+    angles = np.arctan2(edges[:, 1], edges[:, 0])
+    cos, sin = np.cos(angles)[:, np.newaxis], np.sin(angles)[:, np.newaxis]
+    # Hull vertices in the frame of every candidate edge at once
+    along = cos * hull[:, 0] + sin * hull[:, 1]
+    across = cos * hull[:, 1] - sin * hull[:, 0]
+    low = np.stack([along.min(axis=1), across.min(axis=1)], axis=1)
+    high = np.stack([along.max(axis=1), across.max(axis=1)], axis=1)
+    best = np.argmin(np.prod(high - low, axis=1))
+
+    axis = np.array([cos[best, 0], sin[best, 0]])
+    middle = (low[best] + high[best]) / 2
+    center = middle[0] * axis + middle[1] * np.array([-axis[1], axis[0]])
+    size = high[best] - low[best]
+    if size[1] > size[0]:
+        axis = np.array([-axis[1], axis[0]])
+        size = size[::-1]
+    return center, axis, size
+
+
+def occupancy_cells(coords, counts, starts, cell_sizes):
+    """Occupied grid cells of all planes; return (plane, column, row) arrays and the
+    per-plane grid corner.
+
+    Every plane has its own cell size. Columns and rows start at 1 so that
+    every neighbour of a cell has a non-negative index.
+    """
+    scale = np.repeat(cell_sizes, counts)[:, np.newaxis]
+    cells = np.floor(coords / scale).astype(np.int64)
+    corners = np.minimum.reduceat(cells, starts) - 1
+    cells -= np.repeat(corners, counts, axis=0)
+    plane_ids = np.repeat(np.arange(len(counts)), counts)
+    width, height = cells.max(axis=0) + 2
+    # Sorting and dropping repeats beats np.unique's hashing on large inputs
+    keys = np.sort((plane_ids * width + cells[:, 0]) * height + cells[:, 1])
+    keys = keys[np.flatnonzero(np.diff(keys, prepend=-1))]
+    return keys // (width * height), keys // height % width, keys % height, corners
+
+
+def trace_outlines(plane_ids, columns, rows):
+    """Outer outline of the occupied cells of every plane, as grid corner polygons.
+
+    Every cell side without an occupied neighbour becomes a directed edge,
+    counter-clockwise around the occupied area. Edges are chained into loops
+    (turning left first where two loops touch at a corner), loops are
+    labelled and ordered by pointer jumping, and each plane keeps the loop
+    enclosing the largest area. Returns (plane of each vertex, x, y) in loop
+    order, grouped by plane.
+    """
+    width = columns.max() + 2
+    height = rows.max() + 2
+    cell_keys = (plane_ids * width + columns) * height + rows
+
+    # Boundary edges: start corner and direction of each exposed cell side
+    starts = []
+    for direction, (offset, corner) in enumerate(
+        [((0, -1), (0, 0)), ((1, 0), (1, 0)), ((0, 1), (1, 1)), ((-1, 0), (0, 1))]
+    ):
+        neighbour = cell_keys + offset[0] * height + offset[1]
+        found = np.minimum(np.searchsorted(cell_keys, neighbour), len(cell_keys) - 1)
+        exposed = np.flatnonzero(cell_keys[found] != neighbour)
+        starts.append(
+            np.stack(
+                [
+                    plane_ids[exposed],
+                    columns[exposed] + corner[0],
+                    rows[exposed] + corner[1],
+                    np.full(len(exposed), direction),
+                ],
+                axis=1,
+            )
+        )
+    edges = np.concatenate(starts)
+    ends = edges[:, 1:3] + _STEPS[edges[:, 3]]
+
+    # Successor: the edge leaving our end corner, preferring left, straight, right
+    def edge_key(plane, x, y, direction):
+        return ((plane * (width + 1) + x) * (height + 1) + y) * 4 + direction
+
+    keys = edge_key(edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3])
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    successor = np.full(len(edges), -1)
+    for turn in (1, 0, 3):
+        wanted = edge_key(edges[:, 0], ends[:, 0], ends[:, 1], (edges[:, 3] + turn) % 4)
+        found = np.minimum(np.searchsorted(sorted_keys, wanted), len(keys) - 1)
+        hit = (successor < 0) & (sorted_keys[found] == wanted)
+        successor[hit] = order[found[hit]]
+
+    # Label every loop by its smallest edge index, then rank edges from it
+    loops = np.arange(len(edges))
+    jump = successor.copy()
+    steps = 1
+    while steps < len(edges):
+        loops = np.minimum(loops, loops[jump])
+        jump = jump[jump]
+        steps *= 2
+    is_root = loops == np.arange(len(edges))
+    jump = np.where(is_root, np.arange(len(edges)), successor)
+    distance = (~is_root).astype(np.int64)
+    steps = 1
+    while steps < len(edges):
+        distance += distance[jump]
+        jump = jump[jump]
+        steps *= 2
+    lengths = np.bincount(loops, minlength=len(edges))
+    position = np.where(is_root, 0, lengths[loops] - distance)
+
+    # Shoelace area of every loop; the outer outline is the largest per plane
+    x, y = edges[:, 1].astype(np.float64), edges[:, 2].astype(np.float64)
+    twice_area = np.bincount(loops, weights=x * ends[:, 1] - ends[:, 0] * y)
+    roots = np.flatnonzero(lengths)
+    roots = roots[np.lexsort((-twice_area[roots], edges[roots, 0]))]
+    first = np.concatenate([[True], np.diff(edges[roots, 0]) != 0])
+    outer = np.zeros(len(edges), dtype=bool)
+    outer[roots[first]] = True
+
+    kept = np.flatnonzero(outer[loops])
+    kept = kept[np.lexsort((position[kept], edges[kept, 0]))]
+    return edges[kept, 0], edges[kept, 1], edges[kept, 2]
+
+
+def simplify_polygons(plane_ids, xy, tolerance):
+    """Drop vertices closer than tolerance to the line through their neighbours.
+
+    tolerance is a scalar or one value per vertex. Rounds of removal run on all
+    polygons at once: every round drops the vertices that deviate less than
+    both neighbours, so no two neighbours go together, and no polygon drops
+    below three vertices.
+    """
+    tolerance = np.broadcast_to(tolerance, len(xy))
+    while True:
+        counts = np.bincount(plane_ids)
+        first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        index = np.arange(len(xy))
+        offset = index - first[plane_ids]
+        size = counts[plane_ids]
+        previous = first[plane_ids] + (offset - 1) % size
+        following = first[plane_ids] + (offset + 1) % size
+
+        chord = xy[following] - xy[previous]
+        relative = xy - xy[previous]
+        length = np.linalg.norm(chord, axis=1)
+        cross = np.abs(chord[:, 0] * relative[:, 1] - chord[:, 1] * relative[:, 0])
+        distance = np.where(
+            length > 0,
+            cross / np.maximum(length, 1e-12),
+            np.linalg.norm(relative, axis=1),
+        )
+        # Rank by deviation; alternating parity breaks ties along straight runs
+        rank = np.empty(len(xy), dtype=np.int64)
+        rank[np.lexsort((offset % 2, distance))] = index
+        remove = (
+            (distance <= tolerance) & (rank < rank[previous]) & (rank < rank[following])
+        )
+        removed = np.bincount(plane_ids, weights=remove, minlength=len(counts))
+        remove &= (counts - removed)[plane_ids] >= 3
+        if not remove.any():
+            return plane_ids, xy
+        plane_ids, xy, tolerance = plane_ids[~remove], xy[~remove], tolerance[~remove]
+
+
+def plane_geometry(points, labels, plane_models, cell_size=AREA_CELL_SIZE, origin=None):
+    """Oriented box, area and outline of every labelled plane, in world coordinates.
+
+    points and plane_models are local to origin; labels gives the plane of
+    every point (-1 for none) and must cover planes 0..len(plane_models)-1.
+    Returns one dict per plane with "oriented_box", "area" and "boundary".
+    """
+    origin = np.zeros(3) if origin is None else origin
+    if not len(plane_models):
+        return []
+    order, starts, counts = group_by_label(labels)
+    centroids, u_axes, v_axes, coords = plane_frames(
+        points, order, starts, counts, plane_models
+    )
+
+    def to_3d(plane, xy):
+        """World coordinates of 2D points in plane's frame."""
+        local = (
+            centroids[plane] + xy[..., :1] * u_axes[plane] + xy[..., 1:] * v_axes[plane]
+        )
+        return to_world(local, origin)
+
+    rectangles = [
+        min_area_rectangle(coords[start : start + count])
+        for start, count in zip(starts, counts)
+    ]
+
+    # Areas and outlines from one occupancy grid over all planes
+    spacing = np.sqrt([np.prod(size) for _, _, size in rectangles] / counts)
+    cell_sizes = np.maximum(cell_size, CELL_SPACINGS * spacing)
+    cell_planes, columns, rows, corners = occupancy_cells(
+        coords, counts, starts, cell_sizes
+    )
+    areas = np.bincount(cell_planes, minlength=len(counts)) * cell_sizes**2
+    outline_planes, outline_x, outline_y = trace_outlines(cell_planes, columns, rows)
+    outline = (
+        np.stack([outline_x, outline_y], axis=1) + corners[outline_planes]
+    ) * cell_sizes[outline_planes, np.newaxis]
+    outline_planes, outline = simplify_polygons(
+        outline_planes, outline, SIMPLIFY_CELLS * cell_sizes[outline_planes]
+    )
+    outline_starts = np.searchsorted(outline_planes, np.arange(len(counts) + 1))
+
+    geometry = []
+    for plane, (center, axis, size) in enumerate(rectangles):
+        boundary = outline[outline_starts[plane] : outline_starts[plane + 1]]
+        geometry.append(
+            {
+                "oriented_box": describe_box(
+                    center,
+                    axis,
+                    size,
+                    u_axes[plane],
+                    v_axes[plane],
+                    lambda xy: to_3d(plane, xy),
+                ),
+                "area": float(areas[plane]),
+                "boundary": to_3d(plane, boundary).tolist(),
+            }
+        )
+    return geometry
+
+
+def merge_geometry(fragments, plane_model, centroid, cell_size=AREA_CELL_SIZE):
+    """Oriented box, area and outline of a plane merged from fragments with geometry.
+
+    Fragments own disjoint points, but a plane cut lengthwise by a tile edge
+    leaves fragments on top of each other: their areas add up, less the
+    cells covered by more than one filled outline. The outlines are sampled
+    into one occupancy grid in the merged plane, with the coarsest fragment
+    cell, and traced again; the oriented box is fitted around them.
+    Everything is in world coordinates.
+    """
+    normal = np.asarray(plane_model, dtype=np.float64)[:3]
+    normal /= np.linalg.norm(normal)
+    u_axis = np.cross(normal, np.eye(3)[np.argmin(np.abs(normal))])
+    u_axis /= np.linalg.norm(u_axis)
+    v_axis = np.cross(normal, u_axis)
+    centroid = np.asarray(centroid, dtype=np.float64)
+
+    def to_3d(xy):
+        """World coordinates of 2D points in the merged plane's frame."""
+        return centroid + xy[..., :1] * u_axis + xy[..., 1:] * v_axis
+
+    # Each fragment's cell, as plane_geometry chose it from its point spacing
+    spacings = [
+        np.sqrt(np.prod(fragment["oriented_box"]["size"]) / fragment["num_points"])
+        for fragment in fragments
+    ]
+    merged_cell = max(cell_size, CELL_SPACINGS * max(spacings))
+
+    # Outline edges sampled at half a cell, so every ring stays closed
+    rings = []
+    covered = []
+    for fragment in fragments:
+        polygon = np.asarray(fragment["boundary"], dtype=np.float64) - centroid
+        if not len(polygon):
+            continue
+        polygon = np.stack([polygon @ u_axis, polygon @ v_axis], axis=1)
+        columns, rows = polygon_cells(polygon, merged_cell)
+        covered.append(columns * 2**32 + rows)
+        edges = np.roll(polygon, -1, axis=0) - polygon
+        steps = np.maximum(
+            np.ceil(np.linalg.norm(edges, axis=1) / (merged_cell / 2)), 1
+        ).astype(np.int64)
+        fractions = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+        fractions = fractions / np.repeat(steps, steps)
+        rings.append(
+            np.repeat(polygon, steps, axis=0)
+            + fractions[:, np.newaxis] * np.repeat(edges, steps, axis=0)
+        )
+    coords = np.vstack(rings)
+
+    cell_planes, columns, rows, corners = occupancy_cells(
+        coords, np.array([len(coords)]), np.array([0]), np.array([merged_cell])
+    )
+    outline_planes, outline_x, outline_y = trace_outlines(cell_planes, columns, rows)
+    outline = (
+        np.stack([outline_x, outline_y], axis=1) + corners[outline_planes]
+    ) * merged_cell
+    _, outline = simplify_polygons(
+        outline_planes, outline, SIMPLIFY_CELLS * merged_cell
+    )
+    center, axis, size = min_area_rectangle(coords)
+
+    # Cells inside more than one outline were counted by several fragments
+    covered = np.sort(np.concatenate(covered))
+    overlap = (
+        len(covered) - np.count_nonzero(np.diff(covered)) - 1 if len(covered) else 0
+    )
+    area = max(
+        sum(fragment["area"] for fragment in fragments) - overlap * merged_cell**2,
+        max(fragment["area"] for fragment in fragments),
+    )
+    return {
+        "oriented_box": describe_box(center, axis, size, u_axis, v_axis, to_3d),
+        "area": float(area),
+        "boundary": to_3d(outline).tolist(),
+    }
+
+
+def polygon_cells(polygon, cell_size):
+    """(columns, rows) of the grid cells whose center lies inside a 2D polygon.
+
+    Cell (i, j) has its center at ((i + 0.5), (j + 0.5)) * cell_size. Every row
+    of centers is cut by the polygon edges at once and filled between
+    alternate crossings (even-odd rule).
+    """
+    rows = np.arange(
+        np.floor(polygon[:, 1].min() / cell_size),
+        np.ceil(polygon[:, 1].max() / cell_size) + 1,
+    ).astype(np.int64)
+    centers = (rows + 0.5) * cell_size
+    start, end = polygon, np.roll(polygon, -1, axis=0)
+    edge, row = np.nonzero((start[:, 1:] <= centers) != (end[:, 1:] <= centers))
+    fraction = (centers[row] - start[edge, 1]) / (end[edge, 1] - start[edge, 1])
+    crossings = start[edge, 0] + fraction * (end[edge, 0] - start[edge, 0])
+    order = np.lexsort((crossings, row))
+    crossings, row = crossings[order], row[order]
+
+    first = np.ceil(crossings[0::2] / cell_size - 0.5).astype(np.int64)
+    last = np.floor(crossings[1::2] / cell_size - 0.5).astype(np.int64)
+    counts = np.maximum(last - first + 1, 0)
+    columns = np.repeat(first, counts) + (
+        np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+    return columns, np.repeat(rows[row[0::2]], counts)
+
+
+def describe_box(center, axis, size, u_axis, v_axis, to_3d):
+    """Oriented box of a 2D rectangle in a plane frame, in the output schema.
+
+    to_3d maps 2D frame coordinates to world coordinates.
+    """
+    normal_axis = np.array([-axis[1], axis[0]])
+    half = size / 2
+    box_corners = np.array(
+        [
+            center + sign_a * half[0] * axis + sign_b * half[1] * normal_axis
+            for sign_a, sign_b in ((-1, -1), (1, -1), (1, 1), (-1, 1))
+        ]
+    )
+    return {
+        "center": to_3d(center).tolist(),
+        "axes": [
+            (axis[0] * u_axis + axis[1] * v_axis).tolist(),
+            (normal_axis[0] * u_axis + normal_axis[1] * v_axis).tolist(),
+        ],
+        "size": size.tolist(),
+        "corners": to_3d(box_corners).tolist(),
+    }
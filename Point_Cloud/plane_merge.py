@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""Merge plane fragments that were detected separately back into whole planes.
+
+Every fragment becomes one row of a compact plane table (unit normal,
+offset, centroid, bounding box). Candidate pairs come from a sorted sweep:
+rows are sorted by their quantized (normal, offset) key and each fragment
+looks up the neighbouring keys with binary searches. The candidates are
+checked for coplanarity and spatial adjacency in one vectorized pass, and the
+confirmed pairs are joined with union-find.
+"""
+
+import numpy as np
+
+from Point_Cloud.plane_detection import classify_plane
+from Point_Cloud.plane_geometry import AREA_CELL_SIZE, merge_geometry
+
+# Fragments within this angle of each other count as parallel
+ANGLE_TOLERANCE_DEG = 5.0
+# Coplanar fragments whose bounding boxes are closer than this (meters) merge
+MERGE_GAP = 1.0
+
+# Columns of the plane table
+NORMAL = slice(0, 3)
+OFFSET = 3
+CENTROID = slice(4, 7)
+LOW = slice(7, 10)
+HIGH = slice(10, 13)
+TABLE_COLUMNS = 13
+
+# Steps to the 81 neighbouring (normal, offset) cells, the own cell included
+_NEIGHBOUR_STEPS = np.array(np.meshgrid(*[(-1, 0, 1)] * 4)).reshape(4, -1).T
+
+
+class UnionFind(object):
+    """Disjoint sets over the integers 0..size-1."""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+    def groups(self):
+        """Lists of members per set, ordered by their smallest member."""
+        groups = {}
+        for item in range(len(self.parent)):
+            groups.setdefault(self.find(item), []).append(item)
+        return [groups[root] for root in sorted(groups)]
+
+
+def plane_table(plane_models, centroids, mins, maxs):
+    """Compact (N, 13) float64 table: unit normal, offset, centroid, box min, box max.
+
+    Offsets are taken through the centroid of each fragment.
+    """
+    table = np.empty((len(plane_models), TABLE_COLUMNS))
+    normals = np.asarray(plane_models, dtype=np.float64).reshape(-1, 4)[:, :3]
+    table[:, NORMAL] = normals / np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    table[:, CENTROID] = centroids
+    table[:, OFFSET] = -np.einsum("ij,ij->i", table[:, NORMAL], table[:, CENTROID])
+    table[:, LOW] = mins
+    table[:, HIGH] = maxs
+    return table
+
+
+def fragment_table(fragments):
+    """Plane table of fragments in the detected_surfaces.json schema."""
+    return plane_table(
+        [fragment["plane_model"] for fragment in fragments],
+        [fragment["centroid"] for fragment in fragments],
+        [fragment["bounding_box"]["min"] for fragment in fragments],
+        [fragment["bounding_box"]["max"] for fragment in fragments],
+    )
+
+
+def candidate_pairs(table, offset_tolerance, angle_tolerance=ANGLE_TOLERANCE_DEG):
+    """Pairs (first < second) of rows in the same or neighbouring (normal, offset) cells.
+
+    Rows are entered in both orientations, since a plane and its flipped twin
+    are the same plane, and sorted by cell key; the rows in each neighbouring
+    cell are then one contiguous run found with two binary searches.
+    """
+    normals = table[:, NORMAL]
+    # Offsets relative to the scene center keep them small for georeferenced data
+    reference = table[:, CENTROID].mean(axis=0)
+    offsets = -np.einsum("ij,ij->i", normals, table[:, CENTROID] - reference)
+    spread = np.linalg.norm(table[:, CENTROID] - reference, axis=1).max()
+    normal_bin = 2 * np.sin(np.radians(angle_tolerance) / 2)
+    offset_bin = offset_tolerance + normal_bin * spread
+
+    quantized = np.floor(
+        np.vstack(
+            [
+                np.column_stack([normals / normal_bin, offsets / offset_bin]),
+                np.column_stack([-normals / normal_bin, -offsets / offset_bin]),
+            ]
+        )
+    ).astype(np.int64)
+    # One cell of padding on every side keeps neighbour keys inside the grid
+    quantized -= quantized.min(axis=0) - 1
+    dims = quantized.max(axis=0) + 2
+    strides = np.array([dims[1] * dims[2] * dims[3], dims[2] * dims[3], dims[3], 1])
+    keys = quantized @ strides
+    owners = np.tile(np.arange(len(table)), 2)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    wanted = keys[: len(table), np.newaxis] + _NEIGHBOUR_STEPS @ strides
+    low = np.searchsorted(sorted_keys, wanted, side="left").ravel()
+    high = np.searchsorted(sorted_keys, wanted, side="right").ravel()
+    counts = high - low
+    firsts = np.repeat(np.repeat(np.arange(len(table)), len(_NEIGHBOUR_STEPS)), counts)
+    # Position of every candidate: its run's first index plus its rank in the run
+    runs = np.repeat(low - np.cumsum(counts) + counts, counts)
+    seconds = owners[order[runs + np.arange(counts.sum())]]
+
+    # Keep every unordered pair once
+    keep = firsts < seconds
+    pair_keys = np.sort(firsts[keep] * len(table) + seconds[keep])
+    pair_keys = pair_keys[np.flatnonzero(np.diff(pair_keys, prepend=-1))]
+    return pair_keys // len(table), pair_keys % len(table)
+
+
+def coplanar_pairs(table, offset_tolerance, gap, angle_tolerance=ANGLE_TOLERANCE_DEG):
+    """Candidate pairs that are parallel, coplanar and have touching bounding boxes.
+
+    Coplanar means each centroid lies within offset_tolerance of the other
+    plane; boxes touch when they overlap once grown by gap.
+    """
+    first, second = candidate_pairs(table, offset_tolerance, angle_tolerance)
+    normals, offsets = table[:, NORMAL], table[:, OFFSET]
+    centroids = table[:, CENTROID]
+    parallel = np.abs(np.einsum("ij,ij->i", normals[first], normals[second])) >= np.cos(
+        np.radians(angle_tolerance)
+    )
+    coplanar = (
+        np.abs(
+            np.einsum("ij,ij->i", normals[first], centroids[second]) + offsets[first]
+        )
+        <= offset_tolerance
+    ) & (
+        np.abs(
+            np.einsum("ij,ij->i", normals[second], centroids[first]) + offsets[second]
+        )
+        <= offset_tolerance
+    )
+    touching = np.all(
+        (table[first, LOW] - gap <= table[second, HIGH])
+        & (table[second, LOW] - gap <= table[first, HIGH]),
+        axis=1,
+    )
+    confirmed = parallel & coplanar & touching
+    return first[confirmed], second[confirmed]
+
+
+def coplanar_groups(table, offset_tolerance, gap, angle_tolerance=ANGLE_TOLERANCE_DEG):
+    """Lists of table rows that form one plane, ordered by their smallest row."""
+    union_find = UnionFind(len(table))
+    for first, second in zip(
+        *coplanar_pairs(table, offset_tolerance, gap, angle_tolerance)
+    ):
+        union_find.union(int(first), int(second))
+    return union_find.groups()
+
+
+def average_plane(plane_models, centroids, weights):
+    """Weighted mean plane [a, b, c, d] and centroid of coplanar fragments."""
+    models = np.array(plane_models, dtype=np.float64)
+    # Orient every normal like the largest fragment before averaging
+    reference = models[np.argmax(weights), :3]
+    models[np.dot(models[:, :3], reference) < 0] *= -1
+    normal = np.average(models[:, :3], axis=0, weights=weights)
+    normal /= np.linalg.norm(normal)
+    centroid = np.average(centroids, axis=0, weights=weights)
+    return np.append(normal, -np.dot(normal, centroid)), centroid
+
+
+def merge_group(fragments, cell_size=AREA_CELL_SIZE):
+    """Combine coplanar fragments into one plane summary.
+
+    Fragments that carry an area also get their geometry merged.
+    """
+    weights = np.array([fragment["num_points"] for fragment in fragments], float)
+    plane_model, centroid = average_plane(
+        [fragment["plane_model"] for fragment in fragments],
+        [fragment["centroid"] for fragment in fragments],
+        weights,
+    )
+    surface = {
+        "type": classify_plane(plane_model[:3]),
+        "plane_id": None,
+        "bounding_box": {
+            "min": np.min(
+                [fragment["bounding_box"]["min"] for fragment in fragments], axis=0
+            ).tolist(),
+            "max": np.max(
+                [fragment["bounding_box"]["max"] for fragment in fragments], axis=0
+            ).tolist(),
+        },
+        "num_points": int(weights.sum()),
+        "plane_model": plane_model.tolist(),
+        "centroid": centroid.tolist(),
+    }
+    if all("area" in fragment for fragment in fragments):
+        surface.update(merge_geometry(fragments, plane_model, centroid, cell_size))
+    return surface
+
+
+def merge_plane_fragments(
+    fragments,
+    offset_tolerance,
+    gap,
+    angle_tolerance=ANGLE_TOLERANCE_DEG,
+    cell_size=AREA_CELL_SIZE,
+):
+    """Merge coplanar, adjacent plane fragments into whole planes.
+
+    Callers pass fragments in a fixed order (by tile key), so the merged
+    planes are the same however many workers produced them.
+    """
+    if not fragments:
+        return []
+
+    groups = coplanar_groups(
+        fragment_table(fragments), offset_tolerance, gap, angle_tolerance
+    )
+    merged = [
+        merge_group([fragments[index] for index in group], cell_size)
+        for group in groups
+    ]
+    merged.sort(key=lambda plane: -plane["num_points"])
+    for plane_id, plane in enumerate(merged):
+        plane["plane_id"] = plane_id
+    return merged
+
+
+def merge_detected_planes(
+    points,
+    planes,
+    labels,
+    offset_tolerance,
+    gap=MERGE_GAP,
+    angle_tolerance=ANGLE_TOLERANCE_DEG,
+):
+    """Merge coplanar, adjacent planes of one detection run; return (planes, labels).
+
+    planes are (plane_model, inliers, info) as the detection engines return
+    them. Merged planes take the union of their inliers, the weighted mean
+    model and the info of their largest fragment; they are numbered from the
+    largest down and labels are renumbered to match.
+    """
+    if len(planes) < 2:
+        return planes, labels
+
+    plane_points = [np.asarray(points[inliers], np.float64) for _, inliers, _ in planes]
+    table = plane_table(
+        [plane_model for plane_model, _, _ in planes],
+        [block.mean(axis=0) for block in plane_points],
+        [block.min(axis=0) for block in plane_points],
+        [block.max(axis=0) for block in plane_points],
+    )
+    groups = coplanar_groups(table, offset_tolerance, gap, angle_tolerance)
+    if len(groups) == len(planes):
+        return planes, labels
+
+    merged = []
+    for group in groups:
+        weights = np.array([len(planes[index][1]) for index in group], float)
+        plane_model, _ = average_plane(
+            [planes[index][0] for index in group], table[group, CENTROID], weights
+        )
+        inliers = np.sort(np.concatenate([planes[index][1] for index in group]))
+        merged.append((plane_model, inliers, planes[group[np.argmax(weights)]][2]))
+    merged.sort(key=lambda plane: -len(plane[1]))
+
+    labels = np.full(len(labels), -1, dtype=labels.dtype)
+    for plane_id, (_, inliers, _) in enumerate(merged):
+        labels[inliers] = plane_id
+    return merged, labels
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Binary little-endian PLY export and import of segmented clouds, straight from NumPy."""
+
+import numpy as np
+
+from Point_Cloud.pts_reader import to_world
+
+# Rows packed into one structured buffer per write
+WRITE_CHUNK_POINTS = 1_000_000
+
+PLY_TYPES = {
+    "char": "i1",
+    "int8": "i1",
+    "uchar": "u1",
+    "uint8": "u1",
+    "short": "i2",
+    "int16": "i2",
+    "ushort": "u2",
+    "uint16": "u2",
+    "int": "i4",
+    "int32": "i4",
+    "uint": "u4",
+    "uint32": "u4",
+    "float": "f4",
+    "float32": "f4",
+    "double": "f8",
+    "float64": "f8",
+}
+PLY_NAMES = {"u1": "uchar", "i4": "int", "f4": "float", "f8": "double"}
+
+
+def vertex_dtype(colors=False, normals=False, plane_ids=False):
+    """Little-endian structured dtype of one vertex with the requested fields."""
+    fields = [("x", "<f8"), ("y", "<f8"), ("z", "<f8")]
+    if colors:
+        fields += [("red", "u1"), ("green", "u1"), ("blue", "u1")]
+    if normals:
+        fields += [("nx", "<f4"), ("ny", "<f4"), ("nz", "<f4")]
+    if plane_ids:
+        fields += [("plane_id", "<i4")]
+    return np.dtype(fields)
+
+
+def write_ply(path, points, colors=None, normals=None, plane_ids=None, origin=None):
+    """Write a binary little-endian PLY with x y z [rgb] [normal] [plane_id].
+
+    points are local to origin and written as float64 world coordinates;
+    rows are packed into a structured buffer per chunk, never per point.
+    """
+    dtype = vertex_dtype(colors is not None, normals is not None, plane_ids is not None)
+    origin = np.zeros(3) if origin is None else origin
+    header = ["ply", "format binary_little_endian 1.0", "comment plane_id -1 = none"]
+    header.append("element vertex {}".format(len(points)))
+    for name in dtype.names:
+        header.append(
+            "property {} {}".format(PLY_NAMES[dtype.fields[name][0].str[1:]], name)
+        )
+    header.append("end_header")
+
+    with open(path, "wb") as file:
+        file.write(("\n".join(header) + "\n").encode("ascii"))
+        for start in range(0, len(points), WRITE_CHUNK_POINTS):
+            end = min(start + WRITE_CHUNK_POINTS, len(points))
+            rows = np.empty(end - start, dtype=dtype)
+            xyz = to_world(points[start:end], origin)
+            rows["x"], rows["y"], rows["z"] = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+            if colors is not None:
+                block = colors[start:end]
+                rows["red"], rows["green"], rows["blue"] = block.T
+            if normals is not None:
+                block = normals[start:end]
+                rows["nx"], rows["ny"], rows["nz"] = block.T
+            if plane_ids is not None:
+                rows["plane_id"] = plane_ids[start:end]
+            rows.tofile(file)
+
+
+def read_ply_header(file):
+    """Parse a PLY header; return (format, vertex dtype, vertex count, data offset)."""
+    if file.readline().strip() != b"ply":
+        raise ValueError("Not a PLY file.")
+    data_format = None
+    count = 0
+    fields = []
+    element = None
+    while True:
+        line = file.readline()
+        if not line:
+            raise ValueError("PLY header has no end_header line.")
+        words = line.decode("ascii").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "end_header":
+            break
+        if words[0] == "format":
+            data_format = words[1]
+        elif words[0] == "element":
+            element = words[1]
+            if element == "vertex":
+                count = int(words[2])
+            elif not count:
+                raise ValueError("PLY elements before the vertices are not supported.")
+        elif words[0] == "property" and element == "vertex":
+            if words[1] == "list":
+                raise ValueError("PLY list properties on vertices are not supported.")
+            fields.append((words[2], PLY_TYPES[words[1]]))
+
+    byte_order = {"binary_little_endian": "<", "binary_big_endian": ">"}.get(
+        data_format
+    )
+    if byte_order is None:
+        raise ValueError("Only binary PLY files are supported, not " + str(data_format))
+    dtype = np.dtype([(name, byte_order + code) for name, code in fields])
+    return data_format, dtype, count, file.tell()
+
+
+def read_ply(path):
+    """Read a binary PLY into (points, colors, normals, plane_ids) float64/uint8 arrays.
+
+    Vertex records are memory-mapped and split into columns in one vectorized
+    step each; fields that are absent come back as None.
+    """
+    with open(path, "rb") as file:
+        _, dtype, count, offset = read_ply_header(file)
+    if count:
+        vertices = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+    else:
+        vertices = np.empty(0, dtype=dtype)
+
+    def columns(names, out_dtype):
+        if not all(name in dtype.names for name in names):
+            return None
+        return np.stack([vertices[name] for name in names], axis=1).astype(out_dtype)
+
+    points = columns(("x", "y", "z"), np.float64)
+    colors = columns(("red", "green", "blue"), np.uint8)
+    normals = columns(("nx", "ny", "nz"), np.float32)
+    plane_ids = None
+    if "plane_id" in dtype.names:
+        plane_ids = np.asarray(vertices["plane_id"], dtype=np.int32)
+    return points, colors, normals, plane_ids
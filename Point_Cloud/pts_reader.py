@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Chunked, preallocating reader for ASCII PTS point clouds.
+
+Clouds are held in a compact form: float32 coordinates relative to a float64
+per-cloud origin, uint8 RGB and int16 intensity. World coordinates are only
+rebuilt (origin + local, in float64) for results.
+"""
+
+import os
+
+import numpy as np
+
+from Point_Cloud.revit_transform import transform_block
+
+# Bytes read from disk per block; every block is parsed in one vectorized call
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Compact column types
+POINT_DTYPE = np.float32
+COLOR_DTYPE = np.uint8
+INTENSITY_DTYPE = np.int16
+# Origins are snapped to this grid (meters) so they stay readable in manifests
+ORIGIN_GRID = 1.0
+
+
+class PointCloudData(object):
+    """Parsed point cloud: float32 coordinates local to a float64 origin, plus
+    optional uint8 colors and int16 intensity.
+    """
+
+    def __init__(self, points, colors=None, intensity=None, origin=None):
+        self.points = points
+        self.colors = colors
+        self.intensity = intensity
+        self.origin = np.zeros(3) if origin is None else np.asarray(origin, np.float64)
+
+    def __len__(self):
+        return len(self.points)
+
+    def world_points(self, indices=None):
+        """float64 world coordinates of all points, or of the given indices."""
+        local = self.points if indices is None else self.points[indices]
+        return to_world(local, self.origin)
+
+
+def choose_origin(points):
+    """Origin for a cloud's local coordinates: the minimum of points, snapped down."""
+    if not len(points):
+        return np.zeros(3)
+    return np.floor(np.asarray(points).min(axis=0) / ORIGIN_GRID) * ORIGIN_GRID
+
+
+def to_world(local, origin):
+    """Exact float64 world coordinates of local points."""
+    return np.asarray(local, dtype=np.float64) + origin
+
+
+def plane_to_world(plane_model, origin):
+    """Plane [a, b, c, d] in local coordinates expressed in world coordinates."""
+    plane_model = np.asarray(plane_model, dtype=np.float64)
+    return np.append(plane_model[:3], plane_model[3] - plane_model[:3] @ origin)
+
+
+def column_layout(num_columns):
+    """Return (intensity column, rgb columns) for a PTS line with num_columns values."""
+    if num_columns >= 7:  # x y z intensity r g b
+        return 3, (4, 5, 6)
+    if num_columns == 6:  # x y z r g b
+        return None, (3, 4, 5)
+    if num_columns in (4, 5):  # x y z intensity
+        return 3, None
+    return None, None
+
+
+def read_pts_header(path):
+    """Return (declared point count, column count, byte offset of the first point)."""
+    with open(path, "rb") as file:
+        num_points = int(file.readline().strip())
+        data_offset = file.tell()
+        first_line = file.readline()
+    return num_points, len(first_line.split()), data_offset
+
+
+def parse_block(data, num_columns):
+    """Parse a block of complete PTS lines into an (N, num_columns) float64 array."""
+    num_lines = data.count(b"\n")
+    try:
+        values = np.fromstring(data, dtype=np.float64, sep=" ")
+    except ValueError:
+        values = None
+    if values is not None and values.size == num_lines * num_columns:
+        return values.reshape(-1, num_columns)
+
+    # Ragged or malformed lines: fall back to a per-line parse for this block only
+    rows = []
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) < num_columns:
+            continue
+        try:
+            rows.append([float(value) for value in fields[:num_columns]])
+        except ValueError:
+            continue  # A stray header or text line
+    return np.array(rows, dtype=np.float64).reshape(-1, num_columns)
+
+
+def iter_pts_chunks(path, chunk_bytes=DEFAULT_CHUNK_BYTES, start=None, end=None):
+    """Yield parsed (N, num_columns) blocks of a PTS file, split on line boundaries.
+
+    start and end restrict parsing to a byte range that begins on a line boundary;
+    by default the whole body after the header line is read.
+    """
+    _, num_columns, data_offset = read_pts_header(path)
+    position = data_offset if start is None else start
+
+    with open(path, "rb") as file:
+        if end is None:
+            end = os.fstat(file.fileno()).st_size
+        file.seek(position)
+        remainder = b""
+        while position < end:
+            block = file.read(min(chunk_bytes, end - position))
+            if not block:
+                break
+            position += len(block)
+            if remainder:
+                block = remainder + block
+            cut = block.rfind(b"\n") + 1
+            remainder = block[cut:]
+            if cut:
+                yield parse_block(block[:cut], num_columns)
+
+        if remainder.strip():
+            yield parse_block(remainder + b"\n", num_columns)
+
+
+def store_block(block, row, points, colors=None, intensity=None, origin=0.0):
+    """Copy a parsed block into the compact columns at row; return the next free row."""
+    intensity_column, rgb_columns = column_layout(block.shape[1])
+    end = row + len(block)
+    points[row:end] = block[:, :3] - origin
+    if colors is not None and rgb_columns:
+        colors[row:end] = np.clip(block[:, rgb_columns], 0, 255)
+    if intensity is not None and intensity_column is not None:
+        intensity[row:end] = np.clip(np.rint(block[:, intensity_column]), -32768, 32767)
+    return end
+
+
+def read_pts(path, chunk_bytes=DEFAULT_CHUNK_BYTES, transform=None):
+    """Read a PTS file into arrays preallocated from the declared point count.
+
+    transform is an optional 4x4 matrix applied to every block as it is read.
+    """
+    num_points, num_columns, _ = read_pts_header(path)
+    intensity_column, rgb_columns = column_layout(num_columns)
+
+    capacity = max(num_points, 1)
+    points = np.empty((capacity, 3), dtype=POINT_DTYPE)
+    colors = np.empty((capacity, 3), dtype=COLOR_DTYPE) if rgb_columns else None
+    intensity = (
+        np.empty(capacity, dtype=INTENSITY_DTYPE)
+        if intensity_column is not None
+        else None
+    )
+
+    count = 0
+    origin = None
+    for block in iter_pts_chunks(path, chunk_bytes):
+        block = transform_block(block, transform)
+        if origin is None:
+            origin = choose_origin(block[:, :3])
+        end = count + len(block)
+        if end > capacity:
+            # The header undercounts the body: grow geometrically
+            capacity = max(end, 2 * capacity)
+            points = _grow(points, capacity)
+            colors = _grow(colors, capacity)
+            intensity = _grow(intensity, capacity)
+
+        count = store_block(block, count, points, colors, intensity, origin)
+
+    return PointCloudData(
+        points[:count],
+        colors[:count] if colors is not None else None,
+        intensity[:count] if intensity is not None else None,
+        origin,
+    )
+
+
+def _grow(array, capacity):
+    """Return array resized to capacity rows, keeping its contents."""
+    if array is None:
+        return None
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Coarse-to-fine plane detection: find candidates on a coarse copy, refine at full resolution."""
+
+import numpy as np
+
+from Point_Cloud.downsample import voxel_downsample
+from Point_Cloud.plane_detection import estimate_normals, run_plane_engine
+from Point_Cloud.ransac import fit_plane_svd, plane_inliers
+from Point_Cloud.spatial_index import GridIndex
+
+# Least-squares refits of each candidate against its full-resolution slab
+REFINE_ROUNDS = 2
+# Smallest plane (in coarse points) worth proposing as a candidate
+MIN_COARSE_PLANE_POINTS = 10
+# Coarse candidates only need this fraction of the scaled minimum plane size;
+# surfaces denser than average shrink most, and refinement applies the real limit
+COARSE_SIZE_SLACK = 0.5
+
+
+def coarse_params(params, num_points, num_coarse):
+    """Detection settings scaled from full resolution to the coarse voxel size."""
+    coarse_size = params["coarse_voxel_size"]
+    return dict(
+        params,
+        # The coarse cloud needs a wider neighbourhood for stable normals
+        normal_radius=max(params["normal_radius"], 3 * coarse_size),
+        # Voxel averaging rounds edges off, so allow a wider band
+        distance_threshold=max(params["distance_threshold"], coarse_size / 4),
+        min_plane_points=max(
+            MIN_COARSE_PLANE_POINTS,
+            int(
+                round(
+                    COARSE_SIZE_SLACK
+                    * params["min_plane_points"]
+                    * num_coarse
+                    / num_points
+                )
+            ),
+        ),
+    )
+
+
+def refine_plane(points, candidates, plane_model, distance_threshold):
+    """Refit plane_model on its full-resolution inliers among candidates."""
+    inliers = candidates[
+        plane_inliers(points[candidates], plane_model, distance_threshold)
+    ]
+    for _ in range(REFINE_ROUNDS):
+        if len(inliers) < 3:
+            break
+        plane_model = fit_plane_svd(points[inliers])
+        inliers = candidates[
+            plane_inliers(points[candidates], plane_model, distance_threshold)
+        ]
+    return plane_model, inliers
+
+
+def detect_planes_pyramid(points, params, log=print, rounds=None):
+    """Detect planes on a coarse voxel copy of points, then refine each at full resolution.
+
+    The engine only ever sees the coarse cloud. Each coarse plane is then
+    refit against the full-resolution points in a thin slab around it; the
+    slab is gathered from a grid index, using the cells occupied by the
+    plane's coarse inliers and their neighbours. Planes claim points largest
+    first. Returns (planes, labels) like detect_planes, in indices of points.
+    """
+    coarse_size = params["coarse_voxel_size"]
+    coarse, _, _ = voxel_downsample(points, coarse_size)
+    settings = coarse_params(params, len(points), len(coarse))
+    log(
+        "Pyramid: {} coarse points at {} {} (min plane {} points).".format(
+            len(coarse), coarse_size, params["units"], settings["min_plane_points"]
+        )
+    )
+
+    pcd = estimate_normals(coarse, settings["normal_radius"], params["normal_max_nn"])
+    candidates, _ = run_plane_engine(pcd, settings, log, rounds)
+
+    index = GridIndex(points, 2 * coarse_size)
+    slab_width = settings["distance_threshold"] + coarse_size
+    labels = np.full(len(points), -1, dtype=np.int32)
+    planes = []
+    for plane_model, coarse_indices, info in candidates:
+        nearby = index.query_points(coarse[coarse_indices], dilate=True)
+        nearby = nearby[labels[nearby] < 0]
+        slab = nearby[plane_inliers(points[nearby], plane_model, slab_width)]
+        plane_model, inliers = refine_plane(
+            points, slab, plane_model, params["distance_threshold"]
+        )
+        if len(inliers) < params["min_plane_points"]:
+            log("Skipped small plane with " + str(len(inliers)) + " points.")
+            continue
+
+        inliers = np.sort(inliers)
+        labels[inliers] = len(planes)
+        planes.append(
+            (plane_model, inliers, dict(info, coarse_points=len(coarse_indices)))
+        )
+
+    return planes, labels
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Vectorized plane RANSAC with adaptive early termination and SVD refinement."""
+
+import numpy as np
+
+# Hypotheses scored together in one broadcast pass over the points
+BATCH_SIZE = 32
+# Points scored per step, bounding the (points x hypotheses) distance matrix
+BLOCK_POINTS = 262_144
+DEFAULT_CONFIDENCE = 0.99
+
+
+def fit_plane_svd(points):
+    """Least-squares plane [a, b, c, d] through points (smallest singular vector)."""
+    points = np.asarray(points, dtype=np.float64)
+    centroid = points.mean(axis=0)
+    _, _, vt = np.linalg.svd(points - centroid, full_matrices=False)
+    normal = vt[-1]
+    return np.append(normal, -np.dot(normal, centroid))
+
+
+def required_iterations(inlier_ratio, confidence, sample_size=3):
+    """Iterations needed to draw one all-inlier sample with the given confidence."""
+    p_good = inlier_ratio**sample_size
+    if p_good <= 0:
+        return np.inf
+    if p_good >= 1:
+        return 1
+    return np.log(1 - confidence) / np.log(1 - p_good)
+
+
+def count_inliers(points, normals, offsets, threshold):
+    """Inlier count of every (normal, offset) hypothesis; NaN points never count."""
+    counts = np.zeros(len(normals), dtype=np.int64)
+    for start in range(0, len(points), BLOCK_POINTS):
+        distances = np.abs(points[start : start + BLOCK_POINTS] @ normals.T + offsets)
+        counts += (distances <= threshold).sum(axis=0)
+    return counts
+
+
+def plane_inliers(points, plane_model, threshold):
+    """Indices of points within threshold of plane_model."""
+    distances = np.abs(points @ plane_model[:3] + plane_model[3])
+    return np.flatnonzero(distances <= threshold)
+
+
+def fit_plane_ransac(
+    points,
+    distance_threshold,
+    confidence=DEFAULT_CONFIDENCE,
+    max_iterations=1000,
+    rng=None,
+):
+    """Find the dominant plane among the non-NaN rows of points.
+
+    Hypotheses are drawn and scored in batches; sampling stops as soon as the
+    best inlier ratio seen so far reaches the target confidence. The winner is
+    refined with an SVD fit on its inliers. Returns (plane_model, inliers, info)
+    where info holds the iterations used, inlier ratio and confidence reached.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    live = np.flatnonzero(~np.isnan(points[:, 0]))
+    if len(live) < 3:
+        return np.zeros(4), np.empty(0, dtype=np.int64), {"iterations": 0}
+
+    best_model = None
+    best_count = 0
+    iterations = 0
+    while iterations < max_iterations:
+        batch = min(BATCH_SIZE, max_iterations - iterations)
+        samples = points[live[rng.integers(0, len(live), size=(batch, 3))]]
+        normals = np.cross(samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        valid = lengths > 1e-12  # Skip collinear samples
+        normals = normals[valid] / lengths[valid, np.newaxis]
+        offsets = -np.einsum("ij,ij->i", normals, samples[valid, 0])
+        iterations += batch
+
+        if len(normals):
+            counts = count_inliers(points, normals, offsets, distance_threshold)
+            winner = int(np.argmax(counts))
+            if counts[winner] > best_count:
+                best_count = int(counts[winner])
+                best_model = np.append(normals[winner], offsets[winner])
+
+        if iterations >= required_iterations(best_count / len(live), confidence):
+            break
+
+    if best_model is None:
+        return np.zeros(4), np.empty(0, dtype=np.int64), {"iterations": iterations}
+
+    inliers = plane_inliers(points, best_model, distance_threshold)
+    if len(inliers) >= 3:
+        # Least-squares refinement; keep it only if it does not lose support
+        refined_model = fit_plane_svd(points[inliers])
+        refined_inliers = plane_inliers(points, refined_model, distance_threshold)
+        if len(refined_inliers) >= len(inliers):
+            best_model, inliers = refined_model, refined_inliers
+
+    inlier_ratio = len(inliers) / len(live)
+    info = {
+        "iterations": iterations,
+        "inlier_ratio": inlier_ratio,
+        "confidence": float(1 - (1 - inlier_ratio**3) ** iterations),
+    }
+    return best_model, inliers, info
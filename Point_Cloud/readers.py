@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Pick the PTS or LAS reader for a point cloud file by its extension."""
+
+import os
+
+from Point_Cloud.las_reader import iter_las_chunks, read_las, read_las_header
+from Point_Cloud.pts_reader import iter_pts_chunks, read_pts, read_pts_header
+from Point_Cloud.revit_transform import transform_chunks
+
+LAS_EXTENSIONS = (".las",)
+
+
+def is_las(path):
+    """True when path names a LAS file."""
+    return os.path.splitext(path)[1].lower() in LAS_EXTENSIONS
+
+
+def declared_point_count(path):
+    """Point count stated in the file header."""
+    if is_las(path):
+        return read_las_header(path).num_points
+    return read_pts_header(path)[0]
+
+
+def iter_point_chunks(path, transform=None):
+    """Yield parsed blocks in the PTS column layout, from a PTS or LAS file.
+
+    transform is an optional 4x4 matrix applied to each block's coordinates.
+    """
+    chunks = iter_las_chunks(path) if is_las(path) else iter_pts_chunks(path)
+    if transform is None:
+        return chunks
+    return transform_chunks(chunks, transform)
+
+
+def read_point_cloud(path, transform=None):
+    """Read a PTS or LAS file into compact PointCloudData columns."""
+    if is_las(path):
+        return read_las(path, transform=transform)
+    return read_pts(path, transform=transform)
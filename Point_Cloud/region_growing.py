@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""KD-tree region growing over estimated normals: all planar segments in one pass."""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from Point_Cloud.ransac import fit_plane_svd
+
+# Neighbours linked per point; enough to keep a surface connected
+NUM_NEIGHBORS = 10
+# Neighbouring normals must agree within this angle to join a region
+ANGLE_THRESHOLD_DEG = 10.0
+# Seeds must have neighbours whose normals agree at least this well (mean |cos|)
+MIN_SEED_FLATNESS = 0.95
+# Points queried against the KD-tree per step
+QUERY_BLOCK_POINTS = 1_000_000
+
+
+def neighbor_table(points, radius, num_neighbors=NUM_NEIGHBORS, workers=-1):
+    """(N, k) int32 indices of each point's nearest neighbours within radius; -1 pads."""
+    tree = cKDTree(points)
+    table = np.empty((len(points), num_neighbors), dtype=np.int32)
+    for start in range(0, len(points), QUERY_BLOCK_POINTS):
+        _, found = tree.query(
+            points[start : start + QUERY_BLOCK_POINTS],
+            k=num_neighbors + 1,
+            distance_upper_bound=radius,
+            workers=workers,
+        )
+        found = found[:, 1:]  # The first hit is the point itself
+        found[found >= len(points)] = -1
+        table[start : start + len(found)] = found
+    return table
+
+
+def flatness(normals, table):
+    """Mean |cos| between each normal and its neighbours' normals (1 = flat)."""
+    valid = table >= 0
+    agreement = np.abs(np.einsum("ij,ikj->ik", normals, normals[table]))
+    agreement[~valid] = 0
+    return agreement.sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+
+
+def grow_planar_regions(
+    points,
+    normals,
+    radius,
+    distance_threshold,
+    min_plane_points,
+    angle_threshold=ANGLE_THRESHOLD_DEG,
+    num_neighbors=NUM_NEIGHBORS,
+    log=print,
+):
+    """Segment the cloud into planar regions by growing from the flattest seeds.
+
+    Each region grows breadth-first: the whole frontier is expanded in one
+    vectorized step, a neighbour joins when its normal agrees with the
+    region's plane and it lies within distance_threshold of that plane, and the
+    plane is refit from running sums after every step. Every point is expanded
+    at most once. Returns (planes, labels) like detect_planes.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    normals = np.asarray(normals, dtype=np.float64)
+    table = neighbor_table(points, radius, num_neighbors)
+    min_cos = np.cos(np.radians(angle_threshold))
+
+    scores = flatness(normals, table)
+    seeds = np.flatnonzero(scores >= MIN_SEED_FLATNESS)
+    seeds = seeds[np.argsort(-scores[seeds], kind="stable")]
+
+    region = np.full(len(points), -1, dtype=np.int64)  # Every grown region
+    planes = []
+    labels = np.full(len(points), -1, dtype=np.int32)
+    num_regions = 0
+    skipped = 0
+
+    for seed in seeds:
+        if region[seed] >= 0:
+            continue
+        region[seed] = num_regions
+        members = [np.array([seed])]
+        frontier = members[0]
+        # Running sums are kept relative to the seed to avoid cancellation
+        # on georeferenced coordinates
+        anchor = points[seed]
+        count = 1
+        point_sum = np.zeros(3)
+        outer_sum = np.zeros((3, 3))
+        normal = normals[seed]
+        centroid = anchor
+
+        while len(frontier):
+            candidates = table[frontier].ravel()
+            candidates = np.unique(candidates[candidates >= 0])
+            candidates = candidates[region[candidates] < 0]
+            if not len(candidates):
+                break
+            accepted = candidates[
+                (np.abs(normals[candidates] @ normal) >= min_cos)
+                & (
+                    np.abs((points[candidates] - centroid) @ normal)
+                    <= distance_threshold
+                )
+            ]
+            region[accepted] = num_regions
+            members.append(accepted)
+            frontier = accepted
+
+            # Refit the region plane from running sums (covariance eigenvector)
+            local = points[accepted] - anchor
+            count += len(accepted)
+            point_sum += local.sum(axis=0)
+            outer_sum += local.T @ local
+            if len(accepted) and count >= 3:
+                mean = point_sum / count
+                covariance = outer_sum / count - np.outer(mean, mean)
+                normal = np.linalg.eigh(covariance)[1][:, 0]
+                centroid = anchor + mean
+
+        num_regions += 1
+        if count < min_plane_points:
+            skipped += 1
+            continue
+
+        indices = np.sort(np.concatenate(members))
+        labels[indices] = len(planes)
+        plane_model = fit_plane_svd(points[indices])
+        planes.append((plane_model, indices, {"engine": "region-growing"}))
+
+    # Largest planes first, matching sequential RANSAC's output order
+    order = sorted(range(len(planes)), key=lambda index: -len(planes[index][1]))
+    # One spare slot so that label -1 indexes the last entry and stays -1
+    remap = np.full(len(planes) + 1, -1, dtype=np.int32)
+    remap[np.array(order, dtype=np.int64)] = np.arange(len(planes), dtype=np.int32)
+    labels = remap[labels]
+    planes = [planes[index] for index in order]
+
+    log(
+        "Region growing: {} regions, {} planes, {} below {} points.".format(
+            num_regions, len(planes), skipped, min_plane_points
+        )
+    )
+    return planes, labels
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Revit point cloud transforms, as exported by DevButton_17, applied to scan blocks.
+
+DevButton_17 writes point_cloud_data_with_transform.json: one entry per
+PointCloudInstance with the origin and basis of its total transform in Revit
+internal units (feet). Scans are in meters, so the 4x4 matrix built here
+first converts meters to feet and then applies the instance transform. Blocks
+are transformed one at a time while they are read, never as a second copy of
+the whole cloud.
+"""
+
+import json
+import os
+
+import numpy as np
+
+FEET_PER_METER = 1 / 0.3048
+# Default location written by DevButton_17
+DEFAULT_TRANSFORM_PATH = "C:\\Zonneveld\\temp\\point_cloud_data_with_transform.json"
+
+
+def revit_matrix(transform, length_scale=FEET_PER_METER):
+    """4x4 matrix mapping scan coordinates to Revit model coordinates.
+
+    The basis vectors already carry the instance scale, so transform["scale"]
+    is not applied a second time.
+    """
+    matrix = np.eye(4)
+    basis = np.column_stack(
+        [transform["basis_x"], transform["basis_y"], transform["basis_z"]]
+    )
+    matrix[:3, :3] = basis * length_scale
+    matrix[:3, 3] = transform["origin"]
+    return matrix
+
+
+def select_transform(entries, point_cloud_path, name=None):
+    """The exported entry that belongs to point_cloud_path.
+
+    An explicit name must match an instance name. Otherwise a single entry is
+    taken as is, and with several the instance or scan named after the file
+    stem is used.
+    """
+    if name is not None:
+        matches = [entry for entry in entries if entry["name"] == name]
+    elif len(entries) == 1:
+        matches = entries
+    else:
+        stem = os.path.splitext(os.path.basename(point_cloud_path))[0].lower()
+        matches = [
+            entry
+            for entry in entries
+            if stem
+            in [
+                os.path.splitext(label)[0].lower()
+                for label in [entry["name"]] + list(entry.get("scans", []))
+            ]
+        ]
+    if len(matches) != 1:
+        raise ValueError(
+            "Expected one Revit point cloud for {}, found {}: {}".format(
+                name or os.path.basename(point_cloud_path),
+                len(matches),
+                ", ".join(entry["name"] for entry in entries) or "none exported",
+            )
+        )
+    return matches[0]
+
+
+def load_revit_transform(path, point_cloud_path, name=None):
+    """Return (instance name, 4x4 matrix) for point_cloud_path from DevButton_17's file."""
+    with open(path, "r") as file:
+        entries = json.load(file)
+    entry = select_transform(entries, point_cloud_path, name)
+    return entry["name"], revit_matrix(entry["transform"])
+
+
+def transform_points(xyz, matrix):
+    """Apply a 4x4 affine matrix to (N, 3) points in float64."""
+    return np.asarray(xyz, dtype=np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def transform_block(block, matrix):
+    """Transform the x y z columns of a parsed PTS-layout block in place."""
+    if matrix is not None:
+        block[:, :3] = transform_points(block[:, :3], matrix)
+    return block
+
+
+def transform_chunks(chunks, matrix):
+    """Yield the blocks of chunks with their coordinates transformed."""
+    for block in chunks:
+        yield transform_block(block, matrix)
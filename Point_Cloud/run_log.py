@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Buffered run log: a background thread writes text and JSON-lines files.
+
+Callers only append to an in-memory ring buffer; one flusher thread keeps the
+log files open and writes whole batches, so logging inside hot loops costs
+no file open/close. Files are rotated by size, and everything still buffered
+is written on exit, including exits through an uncaught exception.
+"""
+
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# Records held in memory between flushes; the oldest are dropped beyond this
+BUFFER_RECORDS = 10000
+# Seconds between background flushes
+FLUSH_INTERVAL = 0.5
+# Rotate a log file once it grows past this many bytes, keeping this many old ones
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 3
+
+# Loggers of this process that are still open; the exit hooks close them all
+_open_loggers = []
+_previous_excepthook = None
+
+
+def close_all():
+    """Flush and close every open logger of this process."""
+    for logger in list(_open_loggers):
+        logger.close()
+
+
+def _excepthook(exc_type, exc_value, exc_traceback):
+    """Log an uncaught exception to every open logger, then close them."""
+    message = "Unhandled exception: " + "".join(
+        traceback.format_exception(exc_type, exc_value, exc_traceback)
+    )
+    for logger in list(_open_loggers):
+        # Queued directly: the previous hook prints the traceback to the console
+        logger.buffer.append(
+            (time.time(), "ERROR", message, {"exception": exc_type.__name__})
+        )
+    close_all()
+    _previous_excepthook(exc_type, exc_value, exc_traceback)
+
+
+def _install_hooks():
+    """Register the exit hook and the exception hook once per process."""
+    global _previous_excepthook
+    if _previous_excepthook is not None:
+        return
+    _previous_excepthook = sys.excepthook
+    sys.excepthook = _excepthook
+    atexit.register(close_all)
+
+
+def rotate(path, backup_count):
+    """Shift path to path.1, path.1 to path.2, ... dropping the oldest backup."""
+    for index in range(backup_count - 1, 0, -1):
+        older = "{}.{}".format(path, index)
+        if os.path.exists(older):
+            os.replace(older, "{}.{}".format(path, index + 1))
+    if backup_count > 0 and os.path.exists(path):
+        os.replace(path, path + ".1")
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class RunLogger(object):
+    """Leveled logger writing path (text) and path's .jsonl twin from a thread."""
+
+    def __init__(
+        self,
+        path,
+        level="INFO",
+        echo=True,
+        capacity=BUFFER_RECORDS,
+        flush_interval=FLUSH_INTERVAL,
+        max_bytes=MAX_BYTES,
+        backup_count=BACKUP_COUNT,
+    ):
+        self.path = path
+        self.json_path = os.path.splitext(path)[0] + ".jsonl"
+        self.level = LEVELS[level]
+        self.echo = echo
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.buffer = collections.deque(maxlen=capacity)
+        self.dropped = 0
+        self.lock = threading.Lock()  # Serializes writers: flusher and close()
+        self.wake = threading.Event()
+        self.closed = False
+        self.files = {}
+        self.pid = os.getpid()
+
+        self.thread = threading.Thread(target=self._run, name="run-log", daemon=True)
+        self.thread.start()
+        _open_loggers.append(self)
+        _install_hooks()
+
+    def log(self, message, level="INFO", **fields):
+        """Queue one record; echo it to the console when echo is on."""
+        if LEVELS[level] < self.level or self.closed:
+            return
+        if self.echo:
+            print(message)
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1  # The flusher fell behind: the oldest record goes
+            self.wake.set()
+        self.buffer.append((time.time(), level, message, fields))
+        if len(self.buffer) >= self.buffer.maxlen // 2:
+            self.wake.set()
+
+    def flush(self):
+        """Write every buffered record now, from the calling thread."""
+        if os.getpid() != self.pid:
+            # Inherited by a forked worker: these records belong to the parent
+            self.buffer.clear()
+            return
+        with self.lock:
+            records = []
+            while self.buffer:
+                records.append(self.buffer.popleft())
+            if self.dropped:
+                records.insert(
+                    0,
+                    (
+                        time.time(),
+                        "WARNING",
+                        "Log buffer full: dropped {} records.".format(self.dropped),
+                        {},
+                    ),
+                )
+                self.dropped = 0
+            if records:
+                self._write(records)
+
+    def close(self):
+        """Flush and close the log files; later records are ignored."""
+        if self.closed:
+            return
+        self.closed = True
+        if self in _open_loggers:
+            _open_loggers.remove(self)
+        self.wake.set()
+        self.thread.join(timeout=5)
+        self.flush()
+        with self.lock:
+            for file in self.files.values():
+                file.close()
+            self.files = {}
+
+    def _run(self):
+        """Flusher thread: write batches every flush_interval or when woken."""
+        while not self.closed:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def _write(self, records):
+        """Append records to both files, rotating either when it gets too big."""
+        text = []
+        lines = []
+        for created, level, message, fields in records:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created))
+            text.append(message + "\n")
+            record = {"time": stamp, "level": level, "message": message}
+            record.update(fields)
+            lines.append(json.dumps(record, default=str) + "\n")
+        self._append(self.path, "".join(text))
+        self._append(self.json_path, "".join(lines))
+
+    def _append(self, path, data):
+        """Write data through the kept-open handle of path."""
+        file = self.files.get(path)
+        if file is None:
+            directory = os.path.dirname(path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            file = self.files[path] = open(path, "a", encoding="utf-8")
+        file.write(data)
+        file.flush()
+        if self.max_bytes and file.tell() >= self.max_bytes:
+            file.close()
+            rotate(path, self.backup_count)
+            self.files[path] = open(path, "a", encoding="utf-8")
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Uniform grid index: points sorted by cubic cell key for vectorized cell lookups."""
+
+import numpy as np
+
+# Offsets of a cell and its 26 neighbours
+NEIGHBOR_OFFSETS = (
+    np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1])).reshape(3, -1).T
+)
+
+
+class GridIndex(object):
+    """Points bucketed into cubic cells of cell_size, sorted by cell key."""
+
+    def __init__(self, points, cell_size):
+        self.cell_size = float(cell_size)
+        self.origin = np.floor(np.asarray(points.min(axis=0)) / cell_size) * cell_size
+        cells = self.cells_of(points)
+        self.dims = cells.max(axis=0) + 1
+        keys = self.keys_of(cells)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def cells_of(self, points):
+        """Integer (N, 3) cell coordinates of points."""
+        return np.floor((np.asarray(points) - self.origin) / self.cell_size).astype(
+            np.int64
+        )
+
+    def keys_of(self, cells):
+        """Flat int64 key of every cell; -1 for cells outside the grid."""
+        keys = (cells[:, 0] * self.dims[1] + cells[:, 1]) * self.dims[2] + cells[:, 2]
+        outside = np.any((cells < 0) | (cells >= self.dims), axis=1)
+        keys[outside] = -1
+        return keys
+
+    def query_cells(self, cells, dilate=False):
+        """Indices of all points in the given cells (and their neighbours if dilate)."""
+        if dilate:
+            cells = (cells[:, np.newaxis, :] + NEIGHBOR_OFFSETS).reshape(-1, 3)
+        keys = np.unique(self.keys_of(cells))
+        keys = keys[keys >= 0]
+        starts = np.searchsorted(self.sorted_keys, keys, side="left")
+        ends = np.searchsorted(self.sorted_keys, keys, side="right")
+        lengths = ends - starts
+        if not lengths.sum():
+            return np.empty(0, dtype=np.int64)
+
+        # Concatenate the ranges order[start:end] without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.order[offsets + np.arange(lengths.sum())]
+
+    def query_points(self, points, dilate=False):
+        """Indices of all points sharing a cell with (or next to) the given points."""
+        return self.query_cells(self.cells_of(points), dilate)
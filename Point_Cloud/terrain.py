@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Terrain model of the ground points: grid DEM, hole filling and TIN decimation.
+
+Ground points are binned into square cells in one sort; each cell keeps the
+lowest or the median height of its points. Small holes are filled from
+their neighbours, and the filled grid is thinned to a TIN by greedy
+insertion: starting from the hull of the grid, every round inserts the
+worst-fitting cell of each triangle until all cells lie within the
+tolerance of the surface.
+"""
+
+import json
+
+import numpy as np
+from scipy.spatial import ConvexHull, Delaunay
+
+from Point_Cloud.pts_reader import to_world
+
+# DEM cell edge in meters
+DEM_CELL_SIZE = 0.5
+# Height kept per cell: "min" follows the ground under low clutter, "median" is smoother
+DEM_STATISTICS = ("min", "median")
+# Loose points up to this far (meters) from the ground planes count as terrain
+TERRAIN_CLEARANCE = 1.0
+# Largest vertical distance in meters between the TIN and any DEM cell
+TIN_TOLERANCE = 0.05
+# Passes of hole filling; each pass closes holes one cell further inwards
+HOLE_FILL_PASSES = 3
+# Empty cells are filled only with at least this many of their 8 neighbours set
+MIN_FILL_NEIGHBOURS = 4
+# Decimals kept in terrain.json
+TERRAIN_DECIMALS = 3
+
+_NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+
+
+def grid_dem(points, cell_size=DEM_CELL_SIZE, statistic="min"):
+    """Grid of cell heights (NaN where empty); return (heights, grid corner).
+
+    Cell (i, j) spans [corner + (i, j) * cell_size, corner + (i + 1, j + 1) *
+    cell_size) in x and y.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    corner = np.floor(points[:, :2].min(axis=0) / cell_size) * cell_size
+    cells = np.floor((points[:, :2] - corner) / cell_size).astype(np.int64)
+    width, height = cells.max(axis=0) + 1
+    keys = cells[:, 0] * height + cells[:, 1]
+
+    # Sorted by cell and height: the lowest and the median are picked by position
+    order = np.lexsort((points[:, 2], keys))
+    starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+    counts = np.diff(np.append(starts, len(order)))
+    if statistic == "median":
+        picks = starts + (counts - 1) // 2
+    else:
+        picks = starts
+    heights = np.full(width * height, np.nan)
+    heights[keys[order[starts]]] = points[order[picks], 2]
+    return heights.reshape(width, height), corner
+
+
+def fill_holes(heights, passes=HOLE_FILL_PASSES, min_neighbours=MIN_FILL_NEIGHBOURS):
+    """Fill empty cells surrounded by data with the mean of their set neighbours.
+
+    A straight or convex edge of the data has at most three set neighbours
+    per outside cell, so the terrain does not grow outwards.
+    """
+    heights = heights.copy()
+    for _ in range(passes):
+        padded = np.pad(heights, 1, constant_values=np.nan)
+        sums = np.zeros(heights.shape)
+        counts = np.zeros(heights.shape, dtype=np.int64)
+        for dx, dy in _NEIGHBOURS:
+            shifted = padded[
+                1 + dx : 1 + dx + heights.shape[0], 1 + dy : 1 + dy + heights.shape[1]
+            ]
+            valid = ~np.isnan(shifted)
+            sums[valid] += shifted[valid]
+            counts += valid
+        fill = np.isnan(heights) & (counts >= min_neighbours)
+        if not fill.any():
+            break
+        heights[fill] = sums[fill] / counts[fill]
+    return heights
+
+
+def decimate_tin(xy, z, tolerance=TIN_TOLERANCE):
+    """Greedy-insertion TIN over the samples (xy, z); return (vertex indices, faces).
+
+    Faces index into the returned vertex indices. Each round triangulates
+    the vertices so far, interpolates every sample linearly in its triangle
+    and inserts the worst sample of every triangle that misses the
+    tolerance.
+    """
+    try:
+        selected = ConvexHull(xy).vertices
+    except (RuntimeError, ValueError):
+        # Fewer than three samples or all on a line: nothing to decimate
+        return np.arange(len(xy)), np.empty((0, 3), dtype=np.int64)
+    inserted = np.zeros(len(xy), dtype=bool)
+    inserted[selected] = True
+    while True:
+        vertices = np.flatnonzero(inserted)
+        tin = Delaunay(xy[vertices])
+        simplices = tin.find_simplex(xy)
+        inside = simplices >= 0
+        # Barycentric interpolation of every sample in its triangle
+        transforms = tin.transform[simplices[inside]]
+        weights = np.einsum(
+            "ijk,ik->ij", transforms[:, :2], xy[inside] - transforms[:, 2]
+        )
+        weights = np.column_stack([weights, 1 - weights.sum(axis=1)])
+        corners = z[vertices[tin.simplices[simplices[inside]]]]
+        errors = np.zeros(len(xy))
+        errors[inside] = np.abs(z[inside] - np.einsum("ij,ij->i", weights, corners))
+        errors[inserted] = 0
+
+        # Worst sample per triangle, when it misses the tolerance
+        candidates = np.flatnonzero(errors > tolerance)
+        if not len(candidates):
+            return vertices, tin.simplices
+        candidates = candidates[
+            np.lexsort((-errors[candidates], simplices[candidates]))
+        ]
+        first = np.flatnonzero(np.diff(simplices[candidates], prepend=-1))
+        inserted[candidates[first]] = True
+
+
+def terrain_tin(
+    points,
+    cell_size=DEM_CELL_SIZE,
+    statistic="min",
+    tolerance=TIN_TOLERANCE,
+    origin=None,
+):
+    """TIN of ground points as (world vertices, faces), or None without points.
+
+    Triangles whose center falls on an empty DEM cell (outside the ground or
+    in a hole too big to fill) are dropped.
+    """
+    if len(points) < 3:
+        return None
+    heights, corner = grid_dem(points, cell_size, statistic)
+    heights = fill_holes(heights)
+    cells = np.argwhere(~np.isnan(heights))
+    xy = corner + (cells + 0.5) * cell_size
+    vertices, faces = decimate_tin(xy, heights[cells[:, 0], cells[:, 1]], tolerance)
+
+    centers = xy[vertices[faces]].mean(axis=1)
+    center_cells = np.floor((centers - corner) / cell_size).astype(np.int64)
+    center_cells = np.minimum(center_cells, np.array(heights.shape) - 1)
+    faces = faces[~np.isnan(heights[center_cells[:, 0], center_cells[:, 1]])]
+
+    # Keep only the vertices the remaining faces use
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    vertices = vertices[used]
+    local = np.column_stack(
+        [xy[vertices], heights[cells[vertices, 0], cells[vertices, 1]]]
+    )
+    return to_world(local, np.zeros(3) if origin is None else origin), faces
+
+
+def write_terrain(path, vertices, faces, params):
+    """Save the TIN as terrain.json: vertex and face lists without whitespace."""
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "units": params["units"],
+                "cell_size": params["dem_cell_size"],
+                "tolerance": params["tin_tolerance"],
+                "vertices": np.round(vertices, TERRAIN_DECIMALS).tolist(),
+                "faces": faces.tolist(),
+            },
+            file,
+            separators=(",", ":"),
+        )
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Plane detection on one on-disk tile at a time."""
+
+import numpy as np
+from Point_Cloud.downsample import voxel_downsample
+from Point_Cloud.plane_detection import (
+    describe_plane,
+    estimate_normals,
+    run_plane_engine,
+)
+from Point_Cloud.plane_geometry import plane_geometry
+from Point_Cloud.pyramid import detect_planes_pyramid
+from Point_Cloud.tiling import TILE_DTYPE
+
+
+def tile_seed(seed, key):
+    """RANSAC seed of one tile, independent of which worker or order runs it."""
+    return (seed * 73856093 ^ key[0] * 19349663 ^ key[1] * 83492791) & 0x7FFFFFFF
+
+
+def detect_tile_file(tile_path, key, params, origin):
+    """Worker: detect planes in one tile file.
+
+    Returns (key, fragments, log lines, RANSAC round records).
+    """
+    messages = []
+    rounds = []
+    records = np.fromfile(tile_path, dtype=TILE_DTYPE)
+    tile_params = dict(params, seed=tile_seed(params["seed"], key))
+    fragments = detect_tile_planes(
+        records, tile_params, origin, messages.append, rounds
+    )
+    for fragment in fragments:
+        fragment["tile"] = list(key)
+    return key, fragments, messages, rounds
+
+
+def detect_tile_planes(records, params, origin, log=print, rounds=None):
+    """Detect planes in one tile's core and halo records (local to origin).
+
+    Planes are fitted on core and halo points together, but only core inliers
+    are counted, so a point is never reported by two tiles. Fragments are in
+    world coordinates and carry the oriented box, area and outline of their
+    core inliers. When rounds is a list, the RANSAC round records are
+    appended to it.
+    """
+    core = records["core"].astype(bool)
+    points = records["xyz"]
+    if params["voxel_size"] > 0:
+        # Core and halo separately, so every averaged point keeps its ownership
+        core_points, _, _ = voxel_downsample(points[core], params["voxel_size"])
+        halo_points = np.empty((0, 3), dtype=core_points.dtype)
+        if not core.all():
+            halo_points, _, _ = voxel_downsample(points[~core], params["voxel_size"])
+        points = np.vstack([core_points, halo_points])
+        core = np.arange(len(points)) < len(core_points)
+
+    if params["coarse_voxel_size"] > 0:
+        planes, _ = detect_planes_pyramid(points, params, log, rounds)
+    else:
+        pcd = estimate_normals(points, params["normal_radius"], params["normal_max_nn"])
+        planes, _ = run_plane_engine(pcd, params, log, rounds)
+
+    fragments = []
+    plane_models = []
+    labels = np.full(len(points), -1, dtype=np.int64)
+    for plane_model, indices, info in planes:
+        indices = indices[core[indices]]
+        if len(indices):
+            labels[indices] = len(fragments)
+            plane_models.append(plane_model)
+            fragments.append(
+                describe_plane(points, plane_model, indices, None, info, origin)
+            )
+    geometry = plane_geometry(
+        points, labels, plane_models, params["area_cell_size"], origin
+    )
+    for fragment, shape in zip(fragments, geometry):
+        fragment.update(shape)
+    return fragments
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Out-of-core XY tiling: stream a cloud once and bucket it into tile files on disk.
+
+Every tile file holds the tile's own (core) points followed by halo points
+borrowed from its eight neighbours, so per-tile work sees enough context at
+the borders while only one tile has to be in memory at a time.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from Point_Cloud.pts_reader import POINT_DTYPE, choose_origin, column_layout
+
+TILES_VERSION = 2
+MANIFEST_NAME = "tiles.json"
+TILE_DTYPE = np.dtype(
+    [("xyz", POINT_DTYPE, 3), ("rgb", np.uint8, 3), ("core", np.uint8)]
+)
+
+
+def tile_memberships(xy, tile_size, halo):
+    """Yield (tile cells, point mask, is_core) for the core tile and each halo neighbour."""
+    cells = np.floor(xy / tile_size).astype(np.int64)
+    local = xy - cells * tile_size
+    near = {
+        -1: local < halo,
+        0: np.ones_like(local, dtype=bool),
+        1: local >= tile_size - halo,
+    }
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            mask = near[dx][:, 0] & near[dy][:, 1]
+            yield cells[mask] + (dx, dy), mask, dx == 0 and dy == 0
+
+
+def tile_name(key):
+    """File name of the tile with integer cell key (ix, iy)."""
+    return "tile_{}_{}.bin".format(key[0], key[1])
+
+
+class TileStore(object):
+    """Tile files and manifest for one source cloud, tile size and halo width."""
+
+    def __init__(self, directory, source, tile_size, halo):
+        if not 0 <= halo < tile_size:
+            raise ValueError("Tile halo must be smaller than the tile size.")
+        self.directory = directory
+        self.source = source
+        self.tile_size = float(tile_size)
+        self.halo = float(halo)
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.tiles = {}
+        self.origin = np.zeros(3)
+
+    def is_valid(self):
+        """True when tiles exist for the current source and tiling parameters."""
+        try:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (IOError, OSError, ValueError):
+            return False
+        if (
+            manifest.get("version") != TILES_VERSION
+            or manifest.get("source") != self.source
+            or manifest.get("tile_size") != self.tile_size
+            or manifest.get("halo") != self.halo
+        ):
+            return False
+        self.tiles = {
+            tuple(int(value) for value in key.split(",")): counts
+            for key, counts in manifest["tiles"].items()
+        }
+        self.origin = np.array(manifest["origin"], dtype=np.float64)
+        return True
+
+    def build(self, chunks):
+        """Bucket parsed PTS blocks into tile files in a single pass over chunks."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        for name in os.listdir(self.directory):
+            if name.startswith("tile_") or name == MANIFEST_NAME:
+                os.remove(os.path.join(self.directory, name))
+
+        self.tiles = {}
+        origin = None
+        for block in chunks:
+            if origin is None:
+                # Tile records hold float32 coordinates relative to this origin
+                origin = self.origin = choose_origin(block[:, :3])
+            _, rgb_columns = column_layout(block.shape[1])
+            records = np.zeros(len(block), dtype=TILE_DTYPE)
+            records["xyz"] = block[:, :3] - origin
+            if rgb_columns:
+                records["rgb"] = np.clip(block[:, rgb_columns], 0, 255)
+
+            # Tiles follow the world lattice, whatever the origin
+            for cells, mask, is_core in tile_memberships(
+                block[:, :2], self.tile_size, self.halo
+            ):
+                if not len(cells):
+                    continue
+                selected = records[mask]
+                selected["core"] = is_core
+                self._append(cells, selected, "core" if is_core else "halo")
+
+        self._write_manifest()
+        return self.tiles
+
+    def _append(self, cells, records, counter):
+        """Append records to the files of their tiles, grouped by cell key."""
+        keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        for index, key in enumerate(keys):
+            key = (int(key[0]), int(key[1]))
+            group = records[order[bounds[index] : bounds[index + 1]]]
+            with open(os.path.join(self.directory, tile_name(key)), "ab") as file:
+                file.write(group.tobytes())
+            counts = self.tiles.setdefault(key, {"core": 0, "halo": 0})
+            counts[counter] += len(group)
+
+    def _write_manifest(self):
+        """Record the tiles built for the current source and parameters."""
+        manifest = {
+            "version": TILES_VERSION,
+            "source": self.source,
+            "tile_size": self.tile_size,
+            "halo": self.halo,
+            "origin": [float(value) for value in self.origin],
+            "tiles": {
+                "{},{}".format(*key): counts for key, counts in self.tiles.items()
+            },
+        }
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump(manifest, file, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+    def tile_keys(self):
+        """Keys of tiles that own at least one core point, in a fixed order."""
+        return sorted(key for key, counts in self.tiles.items() if counts["core"])
+
+    def tile_path(self, key):
+        """Path of the file holding tile key."""
+        return os.path.join(self.directory, tile_name(key))
+
+    def load(self, key):
+        """Read one tile (core and halo records) into memory."""
+        return np.fromfile(self.tile_path(key), dtype=TILE_DTYPE)
@@ -15,6 +15,8 @@ temp_dir = "C:\\Zonneveld\\temp"
 detected_features_path = os.path.join(temp_dir, "detected_features.json")
 mass_family_name = "AI_Generated_Mass"
 
+FEET_PER_METER = 1 / 0.3048
+
 # Check detected features file
 if not os.path.exists(detected_features_path):
     forms.alert(
@@ -31,6 +33,9 @@ clusters = detected_data.get("detected_features", [])
 if not clusters:
     forms.alert("No valid clusters found.", exitscript=True)
 
+# Clusters analyzed in meters are converted to Revit's internal feet
+length_scale = FEET_PER_METER if detected_data.get("units") == "meters" else 1.0
+
 # Start a transaction
 doc = revit.doc
 with DB.Transaction(doc, "Create AI-Generated In-Place Mass") as transaction:
@@ -42,8 +47,12 @@ with DB.Transaction(doc, "Create AI-Generated In-Place Mass") as transaction:
 
     # **Loop Through Clusters to Create Mass Geometry**
     for cluster in clusters:
-        min_x, min_y, min_z = cluster["bounding_box"]["min"]
-        max_x, max_y, max_z = cluster["bounding_box"]["max"]
+        min_x, min_y, min_z = [
+            value * length_scale for value in cluster["bounding_box"]["min"]
+        ]
+        max_x, max_y, max_z = [
+            value * length_scale for value in cluster["bounding_box"]["max"]
+        ]
 
         width = max_x - min_x
         depth = max_y - min_y
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+__title__ = "Scan \n Levels"
+__doc__ = """Create or update Revit levels at the floor elevations found in the scan."""
+
+import bisect
+import json
+import os
+from pyrevit import revit, DB, forms, script
+
+# Logger
+logger = script.get_logger()
+
+# File paths
+temp_dir = "C:\\Zonneveld\\temp"
+detected_surfaces_path = os.path.join(temp_dir, "detected_surfaces.json")
+
+FEET_PER_METER = 1 / 0.3048
+# Detected levels closer than this (feet) to an existing level update that level
+MATCH_TOLERANCE = 1.0
+
+
+def nearest_level(elevations, elevation):
+    """Index of the sorted elevation closest to elevation, or None when empty."""
+    if not elevations:
+        return None
+    index = bisect.bisect_left(elevations, elevation)
+    candidates = [i for i in (index - 1, index) if 0 <= i < len(elevations)]
+    return min(candidates, key=lambda i: abs(elevations[i] - elevation))
+
+
+# Check detected surfaces file
+if not os.path.exists(detected_surfaces_path):
+    forms.alert(
+        "No detected surfaces found. Ensure AI analysis ran successfully.",
+        exitscript=True,
+    )
+
+# Read detected levels
+with open(detected_surfaces_path, "r") as file:
+    detected_data = json.load(file)
+
+detected_levels = detected_data.get("levels", [])
+if not detected_levels:
+    forms.alert("No floor levels were detected in the scan.", exitscript=True)
+
+# Elevations analyzed in meters are converted to Revit's internal feet
+length_scale = FEET_PER_METER if detected_data.get("units") == "meters" else 1.0
+
+# Sorted elevation index of the existing levels, built once
+doc = revit.doc
+existing_levels = sorted(
+    DB.FilteredElementCollector(doc).OfClass(DB.Level).ToElements(),
+    key=lambda level: level.Elevation,
+)
+existing_elevations = [level.Elevation for level in existing_levels]
+
+# Match every detected level before touching the model
+to_create = []
+to_update = []
+matched = set()
+for detected in detected_levels:
+    elevation = detected["elevation"] * length_scale
+    index = nearest_level(existing_elevations, elevation)
+    if (
+        index is not None
+        and index not in matched
+        and abs(existing_elevations[index] - elevation) <= MATCH_TOLERANCE
+    ):
+        matched.add(index)
+        if abs(existing_elevations[index] - elevation) > 1e-6:
+            to_update.append((existing_levels[index], elevation))
+    else:
+        to_create.append(elevation)
+
+if to_update and not forms.alert(
+    "Move {} existing level(s) to the scanned elevations?".format(len(to_update)),
+    yes=True,
+    no=True,
+):
+    to_update = []
+
+if not to_create and not to_update:
+    forms.alert("All detected levels already exist.", exitscript=True)
+
+# Create and update all levels in one transaction
+with DB.Transaction(doc, "Create Scan Levels") as transaction:
+    transaction.Start()
+
+    for level, elevation in to_update:
+        level.Elevation = elevation
+        logger.info("Moved level " + level.Name + " to " + str(elevation) + " ft")
+
+    for elevation in to_create:
+        level = DB.Level.Create(doc, elevation)
+        name = "Scan Level {:+.2f}".format(elevation / FEET_PER_METER)
+        try:
+            level.Name = name
+        except Exception as e:
+            logger.warning("Kept default name " + level.Name + ": " + str(e))
+        logger.info("Created level " + level.Name + " at " + str(elevation) + " ft")
+
+    transaction.Commit()
+
+forms.alert(
+    "Created {} and updated {} level(s).".format(len(to_create), len(to_update))
+)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+__title__ = "Scan \n Terrain"
+__doc__ = """Create a toposolid or toposurface from the terrain TIN of the scan."""
+
+import json
+import os
+from System.Collections.Generic import List
+from pyrevit import revit, DB, forms, script
+
+# Logger
+logger = script.get_logger()
+
+# File paths
+temp_dir = "C:\\Zonneveld\\temp"
+terrain_path = os.path.join(temp_dir, "terrain.json")
+
+FEET_PER_METER = 1 / 0.3048
+
+# Check terrain file
+if not os.path.exists(terrain_path):
+    forms.alert(
+        "No terrain found. Ensure AI analysis ran successfully.",
+        exitscript=True,
+    )
+
+# Read the TIN
+with open(terrain_path, "r") as file:
+    terrain = json.load(file)
+
+vertices = terrain.get("vertices", [])
+faces = terrain.get("faces", [])
+if len(vertices) < 3 or not faces:
+    forms.alert("The terrain has no triangles.", exitscript=True)
+
+# Vertices analyzed in meters are converted to Revit's internal feet
+length_scale = FEET_PER_METER if terrain.get("units") == "meters" else 1.0
+points = List[DB.XYZ](
+    [
+        DB.XYZ(x * length_scale, y * length_scale, z * length_scale)
+        for x, y, z in vertices
+    ]
+)
+
+doc = revit.doc
+# Toposolids replace toposurfaces from Revit 2024 onwards
+use_toposolid = hasattr(DB, "Toposolid")
+
+with DB.Transaction(doc, "Create Scan Terrain") as transaction:
+    transaction.Start()
+
+    if use_toposolid:
+        topo_type_id = (
+            DB.FilteredElementCollector(doc).OfClass(DB.ToposolidType).FirstElementId()
+        )
+        levels = sorted(
+            DB.FilteredElementCollector(doc).OfClass(DB.Level).ToElements(),
+            key=lambda level: level.Elevation,
+        )
+        if topo_type_id == DB.ElementId.InvalidElementId or not levels:
+            transaction.RollBack()
+            forms.alert(
+                "A toposolid type and a level are needed to create the terrain.",
+                exitscript=True,
+            )
+        # Host on the highest level below the terrain, or else the lowest level
+        lowest = min(point.Z for point in points)
+        below = [level for level in levels if level.Elevation <= lowest]
+        level = below[-1] if below else levels[0]
+        topo = DB.Toposolid.Create(doc, points, topo_type_id, level.Id)
+        logger.info("Created toposolid on level " + level.Name)
+    else:
+        facets = List[DB.PolymeshFacet](
+            [DB.PolymeshFacet(first, second, third) for first, second, third in faces]
+        )
+        topo = DB.Architecture.TopographySurface.Create(doc, points, facets)
+        logger.info("Created toposurface")
+
+    transaction.Commit()
+
+forms.alert(
+    "Created terrain from {} points and {} triangles.".format(len(vertices), len(faces))
+)
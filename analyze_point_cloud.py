@@ -1,134 +1,1003 @@
+import argparse
+import cProfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
 import sys
+import traceback
 import json
 import numpy as np
-import open3d as o3d
 import os
-from sklearn.linear_model import RANSACRegressor
+
+from Point_Cloud.batch import (
+    expand_inputs,
+    estimate_memory,
+    failed_row,
+    format_summary,
+    run_batch,
+    scan_output_dirs,
+    write_summary,
+)
+from Point_Cloud.cache import PointCloudCache
+from Point_Cloud.checkpoint import Checkpoint
+from Point_Cloud.clustering import (
+    CLUSTER_VOXEL_SIZE,
+    ENVELOPE_CELL_SIZE,
+    ENVELOPE_TOLERANCE,
+    GROUND_CLEARANCE,
+    MIN_CLUSTER_POINTS,
+    cluster_points,
+    describe_clusters,
+    ground_planes,
+    lower_envelope,
+    off_ground,
+)
+from Point_Cloud.downsample import voxel_downsample
+from Point_Cloud.metrics import MetricsRecorder
+from Point_Cloud.levels import (
+    LEVEL_BIN_SIZE,
+    LEVEL_CELL_SIZE,
+    LEVEL_SEPARATION,
+    MIN_LEVEL_AREA,
+    describe_levels,
+    find_levels,
+    horizontal_mask,
+    labelled_normals_z,
+)
+from Point_Cloud.normals import estimate_normals_tiled
+from Point_Cloud.parallel_ingest import ingest_pts_parallel
+from Point_Cloud.plane_detection import (
+    DISTANCE_THRESHOLD,
+    MIN_PLANE_POINTS,
+    NORMAL_MAX_NN,
+    NORMAL_RADIUS,
+    NUM_ITERATIONS,
+    describe_plane,
+    estimate_normals,
+    run_plane_engine,
+)
+from Point_Cloud.plane_geometry import AREA_CELL_SIZE, plane_geometry
+from Point_Cloud.plane_merge import (
+    MERGE_GAP,
+    merge_detected_planes,
+    merge_plane_fragments,
+)
+from Point_Cloud.ply import write_ply
+from Point_Cloud.pyramid import detect_planes_pyramid
+from Point_Cloud.ransac import DEFAULT_CONFIDENCE
+from Point_Cloud.revit_transform import (
+    DEFAULT_TRANSFORM_PATH,
+    FEET_PER_METER,
+    load_revit_transform,
+)
+from Point_Cloud.run_log import LEVELS, RunLogger
+from Point_Cloud.readers import (
+    declared_point_count,
+    is_las,
+    iter_point_chunks,
+    read_point_cloud,
+)
+from Point_Cloud.terrain import (
+    DEM_CELL_SIZE,
+    DEM_STATISTICS,
+    TERRAIN_CLEARANCE,
+    TIN_TOLERANCE,
+    terrain_tin,
+    write_terrain,
+)
+from Point_Cloud.tiled_detection import detect_tile_file
+from Point_Cloud.tiling import TileStore
 
 # from sklearn.cluster import DBSCAN, KMeans
 # from scipy.spatial import ConvexHull
 
-# Define file paths
+# Define default file paths
 temp_dir = "C:\\Zonneveld\\temp"
 point_cloud_path = "C:\\Zonneveld\\Point_Clouds\\Aerial scan farmhouse.pts"
-detected_surfaces_path = os.path.join(temp_dir, "detected_surfaces.json")
 log_file_path = os.path.join(temp_dir, "ai_debug_log.txt")
+# Stage timings of the current run, written to metrics.json
+metrics = MetricsRecorder()
+# Buffered writer of log_file_path, opened on first use
+logger = None
 
 
 # Logging function
-def write_log(message):
-    with open(log_file_path, "a") as log_file:
-        log_file.write(message + "\n")
-    print(message)
-
-
-# Load Point Cloud Data
-write_log("Processing Point Cloud: " + point_cloud_path)
-
-if not os.path.exists(point_cloud_path):
-    write_log("Error: PTS file not found.")
-    exit()
-
-# Read PTS file
-with open(point_cloud_path, "r") as file:
-    lines = file.readlines()
-
-num_points = int(lines[0].strip())  # First line contains number of points
-write_log("Found " + str(num_points) + " lines in the PTS file.")
-
-# Parse points
-points = []
-colors = []
-for line in lines[1:]:  # Skip first line
-    values = line.split()
-    if len(values) < 6:
-        continue
-    x, y, z, r, g, b = map(float, values[:6])
-    points.append([x, y, z])
-    colors.append([r / 255, g / 255, b / 255])
-
-points = np.array(points)
-write_log("Loaded " + str(len(points)) + " points.")
-
-# Downsample for performance
-if len(points) > 5_000_000:
-    sample_indices = np.random.choice(len(points), 5_000_000, replace=False)
-    points = points[sample_indices]
-    write_log("Downsampled to 5 million points.")
-
-# Convert to Open3D Point Cloud
-pcd = o3d.geometry.PointCloud()
-pcd.points = o3d.utility.Vector3dVector(points)
-
-# Estimate Normals
-pcd.estimate_normals(
-    search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.5, max_nn=30)
-)
+def write_log(message, level="INFO", **fields):
+    global logger
+    if logger is None or logger.path != log_file_path:
+        if logger is not None:
+            logger.close()
+        logger = RunLogger(log_file_path)
+    logger.log(message, level, **fields)
+
 
-# Convert Open3D points to numpy
-normals = np.asarray(pcd.normals)
+def load_point_cloud(point_cloud_path, cache_dir, workers=1, transform=None):
+    """Open the cached columns of a PTS or LAS file, reading it first on a cache miss.
 
-# RANSAC Plane Detection
-detected_surfaces = []
-plane_count = 0
-write_log("Running RANSAC plane detection...")
+    transform is an optional 4x4 matrix applied to the points while reading.
+    """
+    cache = PointCloudCache(cache_dir, point_cloud_path, transform)
+    if cache.is_valid():
+        # Reuse the binary columns from an earlier parse of the same file
+        write_log("Opened cached point cloud columns: " + cache.directory)
+        return cache.load()
 
-while len(points) > 1000:  # Stop if too few points remain
-    plane_model, inliers = pcd.segment_plane(
-        distance_threshold=0.05, ransac_n=3, num_iterations=1000
+    num_points = declared_point_count(point_cloud_path)
+    write_log(
+        "Found "
+        + str(num_points)
+        + " points declared in the "
+        + ("LAS" if is_las(point_cloud_path) else "PTS")
+        + " file."
     )
 
-    if len(inliers) < 5000:  # Ignore small planes
-        write_log("Skipped small plane with " + str(len(inliers)) + " points.")
-        break
+    if workers > 1 and not is_las(point_cloud_path):
+        # Parse newline-aligned byte ranges in parallel, straight into the cache
+        write_log("Parsing with " + str(workers) + " worker processes.")
+        ingest_pts_parallel(point_cloud_path, cache, workers, transform=transform)
+    else:
+        # Read PTS text in preallocated, vectorized blocks, or map LAS records
+        cache.store(read_point_cloud(point_cloud_path, transform))
 
-    # Extract the plane points
-    plane_points = points[inliers]
-    plane_normals = normals[inliers]
+    write_log("Cached point cloud columns: " + cache.directory)
+    return cache.load()
 
-    # Determine plane type (Wall, Roof, Ground)
-    normal = np.mean(plane_normals, axis=0)
-    plane_type = "Unknown"
 
-    if abs(normal[2]) > 0.9:  # Z-axis normal → Ground
-        plane_type = "Ground"
-    elif abs(normal[2]) < 0.2:  # Mostly vertical → Wall
-        plane_type = "Wall"
-    else:  # Slanted surface → Roof
-        plane_type = "Roof"
+def downsample_cached(cloud, params, cache):
+    """Voxel-downsampled points and colors, reused from the cache when possible.
 
-    # Compute bounding box
-    min_corner = plane_points.min(axis=0).tolist()
-    max_corner = plane_points.max(axis=0).tolist()
+    Returns (points, colors, points_path) with points memory-mapped from the
+    cache, so that normal estimation workers can open the same file.
+    """
+    if params["voxel_size"] <= 0:
+        return cloud.points, cloud.colors, cache.column_path("points")
 
-    detected_surfaces.append(
-        {
-            "type": plane_type,
-            "plane_id": plane_count,
-            "bounding_box": {"min": min_corner, "max": max_corner},
-            "num_points": len(plane_points),
-        }
+    key = {"voxel_size": params["voxel_size"]}
+    points = cache.load_derived("voxel_points", key)
+    if points is None:
+        # Downsample for performance: one averaged point per occupied voxel
+        points, colors, _ = voxel_downsample(
+            cloud.points, params["voxel_size"], cloud.colors
+        )
+        if colors is not None:
+            cache.store_derived("voxel_colors", key, colors)
+        cache.store_derived("voxel_points", key, points)
+        points = cache.load_derived("voxel_points", key)
+        message = "Voxel-downsampled to "
+    else:
+        message = "Loaded cached downsample: "
+    write_log(
+        message
+        + str(len(points))
+        + " points at "
+        + str(params["voxel_size"])
+        + " "
+        + params["units"]
+        + "."
+    )
+    return (
+        points,
+        cache.load_derived("voxel_colors", key),
+        cache.derived_path("voxel_points", key),
     )
 
+
+def normals_cached(points, points_path, params, cache, workers=1):
+    """Normals of points, reused from the cache for the same search parameters."""
+    key = {
+        "voxel_size": params["voxel_size"],
+        "radius": params["normal_radius"],
+        "max_nn": params["normal_max_nn"],
+    }
+    normals = cache.load_derived("normals", key)
+    if normals is not None:
+        write_log(
+            "Loaded cached normals (radius {radius} {units}, max_nn {max_nn}).".format(
+                units=params["units"], **key
+            )
+        )
+        return normals
+
+    if workers > 1:
+        # Tiles with a one-radius halo, written straight into the cache column
+        cache.create_derived("normals", key, points.shape, np.float32)
+        num_tiles = estimate_normals_tiled(
+            points_path,
+            cache.derived_path("normals", key),
+            params["normal_radius"],
+            params["normal_max_nn"],
+            workers,
+        )
+        cache.commit_derived("normals", key)
+        write_log("Estimated normals in " + str(num_tiles) + " tiles.")
+    else:
+        pcd = estimate_normals(points, params["normal_radius"], params["normal_max_nn"])
+        cache.store_derived("normals", key, np.asarray(pcd.normals, dtype=np.float32))
+    return cache.load_derived("normals", key)
+
+
+def detect_surfaces(
+    cloud,
+    params,
+    cache,
+    checkpoint,
+    workers=1,
+    ply_path=None,
+    features_path=None,
+    terrain_path=None,
+):
+    """Detect planes in a fully loaded cloud and the floor levels it holds.
+
+    The levels are recorded as the result of the "levels" checkpoint stage.
+    Optionally clusters the points off the ground into building masses
+    (features_path), builds a TIN of the ground (terrain_path) and exports the
+    labelled cloud to PLY (ply_path).
+    """
+    write_log("Loaded " + str(len(cloud.points)) + " points.")
+    with metrics.stage("downsample", len(cloud.points)):
+        points, colors, points_path = downsample_cached(cloud, params, cache)
+    checkpoint.complete("downsample")
+
+    # Plane Detection
+    if params["engine"] == "region-growing":
+        write_log("Running region-growing plane segmentation...")
+    else:
+        write_log("Running RANSAC plane detection (" + params["ransac"] + ")...")
+    normals = None
+    if params["coarse_voxel_size"] > 0:
+        # Candidates from a coarse copy, refined against the full-resolution points
+        with metrics.stage("detect", len(points)):
+            planes, labels = detect_planes_pyramid(
+                points, params, write_log, metrics.ransac_rounds
+            )
+    else:
+        # Convert to Open3D Point Cloud with cached or freshly estimated normals
+        with metrics.stage("normals", len(points)):
+            normals = normals_cached(points, points_path, params, cache, workers)
+            pcd = estimate_normals(points, normals=normals)
+        checkpoint.complete("normals")
+        with metrics.stage("detect", len(points)):
+            planes, labels = run_plane_engine(
+                pcd, params, write_log, metrics.ransac_rounds
+            )
+
+    # Planes split at occlusions come back as coplanar neighbours: join them
+    with metrics.stage("merge", len(points)):
+        num_fragments = len(planes)
+        planes, labels = merge_detected_planes(
+            points,
+            planes,
+            labels,
+            2 * params["distance_threshold"],
+            params["merge_gap"],
+        )
+    if len(planes) < num_fragments:
+        write_log(
+            "Merged {} plane fragments into {} planes.".format(
+                num_fragments, len(planes)
+            )
+        )
+
+    detected_surfaces = []
+    for plane_count, (plane_model, inliers, info) in enumerate(planes):
+        surface = describe_plane(
+            points, plane_model, inliers, plane_count, info, cloud.origin
+        )
+        detected_surfaces.append(surface)
+        message = (
+            "Detected "
+            + surface["type"]
+            + " plane with ID "
+            + str(plane_count)
+            + " | Points: "
+            + str(surface["num_points"])
+        )
+        if "confidence" in info:
+            message += " | Iterations: {} | Confidence: {:.4f}".format(
+                info["iterations"], info["confidence"]
+            )
+        write_log(
+            message,
+            plane_id=plane_count,
+            type=surface["type"],
+            num_points=surface["num_points"],
+        )
+
+    # Oriented boxes, areas and outlines of all planes in one batch
+    with metrics.stage("geometry", len(points)):
+        geometry = plane_geometry(
+            points,
+            labels,
+            [plane_model for plane_model, _, _ in planes],
+            params["area_cell_size"],
+            cloud.origin,
+        )
+    for surface, shape in zip(detected_surfaces, geometry):
+        surface.update(shape)
+
+    levels = []
+    if params["min_level_area"] > 0:
+        # Without point normals the normal of each point's plane stands in
+        with metrics.stage("levels", len(points)):
+            if normals is not None:
+                normals_z = normals[:, 2]
+            else:
+                normals_z = labelled_normals_z(
+                    labels, [plane_model for plane_model, _, _ in planes]
+                )
+            levels = describe_levels(
+                find_levels(
+                    points[horizontal_mask(normals_z)],
+                    params["level_bin_size"],
+                    params["level_cell_size"],
+                    params["min_level_area"],
+                    params["level_separation"],
+                ),
+                cloud.origin,
+            )
+        write_log(
+            "Detected {} floor levels: {}".format(
+                len(levels),
+                ", ".join("{:.2f}".format(level["elevation"]) for level in levels),
+            )
+        )
+    checkpoint.complete("levels", levels)
+
+    if features_path or terrain_path:
+        with metrics.stage("ground", len(points)):
+            ground = find_ground(points, labels, planes, detected_surfaces, params)
+        write_log(
+            "Ground planes: "
+            + (", ".join(str(plane_id) for plane_id in ground[0]) or "none")
+        )
+
+    if features_path:
+        with metrics.stage("cluster", len(points)):
+            detected_features = cluster_features(
+                points, labels, ground, params, cloud.origin
+            )
+            write_features(features_path, detected_features, params)
+        write_log(
+            "Clustered {} building masses; saved to {}".format(
+                len(detected_features), features_path
+            )
+        )
+
+    if terrain_path:
+        with metrics.stage("terrain", len(points)):
+            tin = ground_terrain(points, labels, ground, params, cloud.origin)
+            if tin is not None:
+                write_terrain(terrain_path, tin[0], tin[1], params)
+        if tin is None:
+            write_log("No ground planes found; terrain.json not written.", "WARNING")
+        else:
+            write_log(
+                "Terrain TIN with {} vertices and {} faces; saved to {}".format(
+                    len(tin[0]), len(tin[1]), terrain_path
+                )
+            )
+
+    if ply_path:
+        # Downsampled points in world coordinates with their plane labels
+        with metrics.stage("export_ply", len(points)):
+            write_ply(ply_path, points, colors, normals, labels, cloud.origin)
+        write_log("Exported segmented cloud to " + ply_path)
+    return detected_surfaces
+
+
+def find_ground(points, labels, planes, detected_surfaces, params):
+    """The ground among the horizontal planes: (ids, models, cell keys, envelope).
+
+    Only horizontal planes on the lower envelope of the scan are ground;
+    floors and flat roofs are not.
+    """
+    keys, envelope = lower_envelope(points, params["envelope_cell_size"])
+    candidates = [
+        plane_id
+        for plane_id, surface in enumerate(detected_surfaces)
+        if surface["type"] == "Ground"
+    ]
+    ground_ids = ground_planes(
+        points, labels, candidates, envelope, params["envelope_tolerance"]
+    )
+    ground_models = [planes[plane_id][0] for plane_id in ground_ids]
+    return ground_ids, ground_models, keys, envelope
+
+
+def cluster_features(points, labels, ground, params, origin):
+    """Building masses: connected clusters of the points off the ground."""
+    selected = np.flatnonzero(
+        off_ground(points, labels, *ground, clearance=params["ground_clearance"])
+    )
+    labels, num_clusters = cluster_points(
+        points[selected], params["cluster_voxel_size"], params["min_cluster_points"]
+    )
+    return describe_clusters(points[selected], labels, num_clusters, origin)
+
+
+def ground_terrain(points, labels, ground, params, origin):
+    """TIN of the ground as (vertices, faces), or None without ground planes.
+
+    The DEM is built from the inliers of the ground planes found by
+    find_ground, plus the loose points within terrain_clearance of them.
+    """
+    if not ground[0]:
+        return None
+    selected = ~off_ground(
+        points, labels, *ground, clearance=params["terrain_clearance"]
+    )
+    return terrain_tin(
+        points[selected],
+        params["dem_cell_size"],
+        params["dem_statistic"],
+        params["tin_tolerance"],
+        origin,
+    )
+
+
+def write_features(path, detected_features, params):
+    """Save clusters as detected_features.json, the file DevButton_14 reads."""
+    with open(path, "w") as file:
+        json.dump(
+            {"units": params["units"], "detected_features": detected_features},
+            file,
+            indent=4,
+        )
+
+
+def log_tile(key, fragments, messages, done, total):
+    """Report the plane fragments found in one tile."""
+    for message in messages:
+        write_log(message)
     write_log(
-        "Detected "
-        + plane_type
-        + " plane with ID "
-        + str(plane_count)
-        + " | Points: "
-        + str(len(plane_points))
+        "Tile {} ({}/{}): {} plane fragments".format(key, done, total, len(fragments))
     )
 
-    plane_count += 1
 
-    # Remove inliers and continue
-    pcd = pcd.select_by_index(inliers, invert=True)
-    points = np.asarray(pcd.points)
-    normals = np.asarray(pcd.normals)
+def detect_surfaces_tiled(
+    point_cloud_path, cache_dir, params, checkpoint, workers=1, transform=None
+):
+    """Detect planes tile by tile, holding one tile and its halo in memory.
+
+    Surfaces get the same geometry as in a whole-cloud run, merged from the
+    tile fragments; floor levels need the whole cloud and are not detected.
+    """
+    cache = PointCloudCache(cache_dir, point_cloud_path, transform)
+    tile_size = params["tile_size"]
+    tile_halo = params["tile_halo"]
+    unit = "ft" if params["units"] == "feet" else "m"
+    tiles_dir = os.path.join(
+        cache.directory,
+        "tiles_{0}{2}_halo_{1}{2}".format(tile_size, tile_halo, unit),
+    )
+    store = TileStore(tiles_dir, cache.source, tile_size, tile_halo)
+    with metrics.stage("tiling") as stage:
+        if store.is_valid():
+            write_log("Reusing tiles in " + tiles_dir)
+        else:
+            # Single streaming pass over the source; nothing is kept in memory
+            write_log("Tiling point cloud into " + tiles_dir)
+            store.build(iter_point_chunks(point_cloud_path, transform))
+        stage["points"] = sum(counts["core"] for counts in store.tiles.values())
+    checkpoint.complete("tiling")
+
+    tile_keys = store.tile_keys()
+    with metrics.stage("detect_tiles", stage["points"]):
+        results = detect_tiles(store, tile_keys, params, checkpoint, workers)
+
+    # Merge planes across tiles in tile order, whatever order workers finished in
+    with metrics.stage("merge"):
+        fragments = [fragment for key in tile_keys for fragment in results[key]]
+        detected_surfaces = merge_plane_fragments(
+            fragments,
+            2 * params["distance_threshold"],
+            tile_halo,
+            cell_size=params["area_cell_size"],
+        )
+    for surface in detected_surfaces:
+        write_log(
+            "Detected "
+            + surface["type"]
+            + " plane with ID "
+            + str(surface["plane_id"])
+            + " | Points: "
+            + str(surface["num_points"]),
+            plane_id=surface["plane_id"],
+            type=surface["type"],
+            num_points=surface["num_points"],
+        )
+    return detected_surfaces
+
+
+def detect_tiles(store, tile_keys, params, checkpoint, workers=1):
+    """Plane fragments of every tile, keyed by tile; checkpointed tiles are reused.
+
+    The RANSAC rounds of the tiles detected in this run are added to
+    metrics.ransac_rounds in tile order, each tagged with its tile.
+    """
+    results = {}
+    tile_rounds = {}
+    for key in tile_keys:
+        fragments = checkpoint.tile_result(key)
+        if fragments is not None:
+            results[key] = fragments
+    if results:
+        write_log(
+            "Resuming: {} of {} tiles already done.".format(
+                len(results), len(tile_keys)
+            )
+        )
+    remaining = [key for key in tile_keys if key not in results]
+
+    # Tiles are independent: detect their planes in a pool of processes
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    detect_tile_file, store.tile_path(key), key, params, store.origin
+                )
+                for key in remaining
+            ]
+            for future in as_completed(futures):
+                key, fragments, messages, rounds = future.result()
+                results[key] = fragments
+                tile_rounds[key] = rounds
+                checkpoint.complete_tile(key, fragments)
+                log_tile(key, fragments, messages, len(results), len(tile_keys))
+    else:
+        for key in remaining:
+            key, fragments, messages, rounds = detect_tile_file(
+                store.tile_path(key), key, params, store.origin
+            )
+            results[key] = fragments
+            tile_rounds[key] = rounds
+            checkpoint.complete_tile(key, fragments)
+            log_tile(key, fragments, messages, len(results), len(tile_keys))
+    for key in tile_keys:
+        for record in tile_rounds.get(key, []):
+            metrics.ransac_rounds.append(dict(record, tile=list(key)))
+    return results
+
+
+def parse_args():
+    """Command line options; the defaults reproduce the original hard-coded run.
+
+    Input patterns are expanded into point_cloud_paths; matching no file is
+    a usage error.
+    """
+    parser = argparse.ArgumentParser(
+        description="Detect planar surfaces in one or more PTS or LAS point clouds."
+    )
+    parser.add_argument(
+        "point_cloud_paths",
+        nargs="*",
+        default=[point_cloud_path],
+        metavar="point_cloud_path",
+        help="PTS or LAS files, or glob patterns, to analyze.",
+    )
+    parser.add_argument(
+        "--temp-dir",
+        default=temp_dir,
+        help="Folder for the cache, log and detected_surfaces.json; with several "
+        "scans, each gets its own subfolder and a batch_summary.csv is written.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Scans analyzed at the same time, each in its own process.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=0,
+        help="GB of estimated peak memory that concurrent scans may share "
+        "(0 = no limit).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes used to parse the PTS file, estimate normals and, with "
+        "--tile-size, to detect planes per tile (0 = one per CPU core).",
+    )
+    parser.add_argument(
+        "--voxel-size",
+        type=float,
+        default=0.05,
+        help="Voxel edge length in meters for downsampling (0 = keep every point).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed for RANSAC plane detection.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("ransac", "region-growing"),
+        default="ransac",
+        help="Plane segmentation: sequential RANSAC or one-pass KD-tree region growing.",
+    )
+    parser.add_argument(
+        "--ransac",
+        choices=("open3d", "numpy"),
+        default="numpy",
+        help="Plane RANSAC: the adaptive NumPy one or Open3D's fixed 1000 iterations.",
+    )
+    parser.add_argument(
+        "--ransac-confidence",
+        type=float,
+        default=DEFAULT_CONFIDENCE,
+        help="Target confidence at which the NumPy RANSAC stops sampling.",
+    )
+    parser.add_argument(
+        "--coarse-voxel-size",
+        type=float,
+        default=0,
+        help="Detect planes on a copy downsampled to this voxel size in meters, then "
+        "refine them at full resolution (0 = detect at full resolution).",
+    )
+    parser.add_argument(
+        "--revit-transform",
+        nargs="?",
+        const=DEFAULT_TRANSFORM_PATH,
+        default=None,
+        help="Apply the Revit point cloud transform exported by DevButton_17 "
+        "(default file: " + DEFAULT_TRANSFORM_PATH + ") while reading, so "
+        "results are in Revit model coordinates and feet. Sizes given in meters "
+        "are converted.",
+    )
+    parser.add_argument(
+        "--revit-cloud",
+        default=None,
+        help="Name of the Revit point cloud instance to take the transform from, "
+        "when the file lists several and none is named after the scan.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip stages and tiles finished by an earlier run with the same input "
+        "and parameters (see checkpoint.json in the output folder).",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=sorted(LEVELS, key=LEVELS.get),
+        default="INFO",
+        help="Least severe level written to ai_debug_log.txt and its .jsonl twin.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Save a cProfile dump (profile.prof) next to metrics.json.",
+    )
+    parser.add_argument(
+        "--cluster-voxel-size",
+        type=float,
+        default=CLUSTER_VOXEL_SIZE,
+        help="Cell size in meters for clustering the points off the ground into "
+        "building masses in detected_features.json (0 = no clustering).",
+    )
+    parser.add_argument(
+        "--min-level-area",
+        type=float,
+        default=MIN_LEVEL_AREA,
+        help="Horizontal area in square meters a height needs to become a floor "
+        "level in detected_surfaces.json (0 = no levels).",
+    )
+    parser.add_argument(
+        "--dem-cell-size",
+        type=float,
+        default=DEM_CELL_SIZE,
+        help="Grid cell in meters of the ground DEM behind terrain.json "
+        "(0 = no terrain).",
+    )
+    parser.add_argument(
+        "--dem-statistic",
+        choices=DEM_STATISTICS,
+        default="min",
+        help="Height kept per DEM cell: the lowest point or the median.",
+    )
+    parser.add_argument(
+        "--tin-tolerance",
+        type=float,
+        default=TIN_TOLERANCE,
+        help="Largest height error in meters when decimating the DEM to a TIN.",
+    )
+    parser.add_argument(
+        "--export-ply",
+        action="store_true",
+        help="Also write segmented_cloud.ply: the downsampled points with color, "
+        "normals and plane_id (-1 = no plane), in world coordinates.",
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=float,
+        default=0,
+        help="XY tile edge in meters for out-of-core processing (0 = load whole cloud).",
+    )
+    parser.add_argument(
+        "--tile-halo",
+        type=float,
+        default=1.0,
+        help="Overlap in meters borrowed from neighbouring tiles.",
+    )
+    args = parser.parse_args()
+    patterns = args.point_cloud_paths
+    args.point_cloud_paths = expand_inputs(patterns)
+    if not args.point_cloud_paths:
+        parser.error("no point cloud files match " + " ".join(patterns))
+    return args
+
+
+def analyze_scan(point_cloud_path, output_dir, args):
+    """Analyze one scan into output_dir; return its batch summary row."""
+    global log_file_path, logger, metrics
+
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    detected_surfaces_path = os.path.join(output_dir, "detected_surfaces.json")
+    detected_features_path = os.path.join(output_dir, "detected_features.json")
+    terrain_path = os.path.join(output_dir, "terrain.json")
+    log_file_path = os.path.join(output_dir, "ai_debug_log.txt")
+    cache_dir = os.path.join(args.temp_dir, "point_cloud_cache")
+    metrics_path = os.path.join(output_dir, "metrics.json")
+    metrics = MetricsRecorder()
+    logger = RunLogger(log_file_path, args.log_level)
+    row = {
+        "scan": point_cloud_path,
+        "status": "ok",
+        "points": None,
+        "surfaces": None,
+        "seconds": None,
+        "output_dir": output_dir,
+    }
+
+    # Load Point Cloud Data
+    write_log("Processing Point Cloud: " + point_cloud_path)
+
+    if not os.path.exists(point_cloud_path):
+        write_log("Error: point cloud file not found.", "ERROR")
+        logger.close()
+        row["status"] = "missing"
+        return row
+
+    # Revit coordinates are in feet: sizes given in meters are scaled to match
+    transform = None
+    length_scale = 1.0
+    if args.revit_transform:
+        try:
+            cloud_name, transform = load_revit_transform(
+                args.revit_transform, point_cloud_path, args.revit_cloud
+            )
+        except (IOError, OSError, ValueError, KeyError) as error:
+            write_log("Error: cannot use the Revit transform: " + str(error), "ERROR")
+            logger.close()
+            row["status"] = "no transform"
+            return row
+        write_log("Applying the Revit transform of point cloud " + cloud_name)
+        length_scale = FEET_PER_METER
+
+    params = {
+        "units": "feet" if transform is not None else "meters",
+        "voxel_size": args.voxel_size * length_scale,
+        "coarse_voxel_size": args.coarse_voxel_size * length_scale,
+        "normal_radius": NORMAL_RADIUS * length_scale,
+        "normal_max_nn": NORMAL_MAX_NN,
+        "distance_threshold": DISTANCE_THRESHOLD * length_scale,
+        "num_iterations": NUM_ITERATIONS,
+        "min_plane_points": MIN_PLANE_POINTS,
+        "seed": args.seed,
+        "engine": args.engine,
+        "ransac": args.ransac,
+        "confidence": args.ransac_confidence,
+        "area_cell_size": AREA_CELL_SIZE * length_scale,
+        "merge_gap": MERGE_GAP * length_scale,
+        "cluster_voxel_size": args.cluster_voxel_size * length_scale,
+        "min_cluster_points": MIN_CLUSTER_POINTS,
+        "ground_clearance": GROUND_CLEARANCE * length_scale,
+        "envelope_cell_size": ENVELOPE_CELL_SIZE * length_scale,
+        "envelope_tolerance": ENVELOPE_TOLERANCE * length_scale,
+        "level_bin_size": LEVEL_BIN_SIZE * length_scale,
+        "level_cell_size": LEVEL_CELL_SIZE * length_scale,
+        "min_level_area": args.min_level_area * length_scale**2,
+        "level_separation": LEVEL_SEPARATION * length_scale,
+        "dem_cell_size": args.dem_cell_size * length_scale,
+        "dem_statistic": args.dem_statistic,
+        "tin_tolerance": args.tin_tolerance * length_scale,
+        "terrain_clearance": TERRAIN_CLEARANCE * length_scale,
+        "tile_size": args.tile_size * length_scale,
+        "tile_halo": args.tile_halo * length_scale,
+    }
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    try:
+        # Checkpoints only count for the same input and the same settings
+        checkpoint = Checkpoint(
+            output_dir,
+            point_cloud_path,
+            dict(
+                params,
+                export_ply=args.export_ply,
+                transform=None if transform is None else transform.tolist(),
+            ),
+            args.resume,
+        )
+        if checkpoint.resumed:
+            write_log(
+                "Resuming from checkpoint; finished stages: "
+                + (", ".join(checkpoint.manifest["stages"]) or "none")
+            )
+        elif args.resume:
+            write_log("No matching checkpoint; starting from the beginning.")
+
+        detected_surfaces = checkpoint.result("detect")
+        if detected_surfaces is None:
+            # Optional outputs of an earlier run must not outlive this one
+            remove_stale_outputs(
+                [
+                    detected_features_path,
+                    terrain_path,
+                    os.path.join(output_dir, "segmented_cloud.ply"),
+                ]
+            )
+        if detected_surfaces is not None:
+            write_log("Reusing {} detected surfaces.".format(len(detected_surfaces)))
+        elif args.tile_size > 0:
+            if (
+                args.export_ply
+                or args.cluster_voxel_size > 0
+                or args.min_level_area > 0
+                or args.dem_cell_size > 0
+            ):
+                write_log(
+                    "Clustering, floor levels, terrain and PLY export need the whole "
+                    "cloud in memory; skipped with --tile-size.",
+                    "WARNING",
+                )
+            detected_surfaces = detect_surfaces_tiled(
+                point_cloud_path, cache_dir, params, checkpoint, workers, transform
+            )
+        else:
+            with metrics.stage("parse") as stage:
+                cloud = load_point_cloud(
+                    point_cloud_path, cache_dir, workers, transform
+                )
+                stage["points"] = len(cloud)
+            checkpoint.complete("parse")
+            cache = PointCloudCache(cache_dir, point_cloud_path, transform)
+            ply_path = (
+                os.path.join(output_dir, "segmented_cloud.ply")
+                if args.export_ply
+                else None
+            )
+            features_path = (
+                detected_features_path if args.cluster_voxel_size > 0 else None
+            )
+            detected_surfaces = detect_surfaces(
+                cloud,
+                params,
+                cache,
+                checkpoint,
+                workers,
+                ply_path,
+                features_path,
+                terrain_path if args.dem_cell_size > 0 else None,
+            )
+        checkpoint.complete("detect", detected_surfaces)
+
+        # Save detected surfaces
+        with metrics.stage("output"):
+            output = {
+                "units": params["units"],
+                "detected_surfaces": detected_surfaces,
+                "levels": checkpoint.result("levels") or [],
+            }
+            if args.tile_size > 0:
+                # Levels need the whole cloud: an empty list means not detected
+                output["omitted"] = ["levels"]
+            with open(detected_surfaces_path, "w") as file:
+                json.dump(output, file, indent=4)
+        checkpoint.complete("output")
+
+        if profiler:
+            profiler.disable()
+            profile_path = os.path.join(output_dir, "profile.prof")
+            profiler.dump_stats(profile_path)
+            write_log("Saved cProfile dump to " + profile_path)
+
+        summary = metrics.summary()
+        metrics.write(
+            metrics_path,
+            {
+                "source": os.path.abspath(point_cloud_path),
+                "workers": workers,
+                "params": params,
+                "num_surfaces": len(detected_surfaces),
+            },
+        )
+        write_log(
+            "Feature detection completed. Output saved to " + detected_surfaces_path
+        )
+        print("AI Analysis Completed.")
+    except Exception:
+        write_log("Error: analysis failed.\n" + traceback.format_exc(), "ERROR")
+        raise
+    finally:
+        logger.close()
+
+    row["points"] = metrics.stages[0]["points"]
+    row["surfaces"] = len(detected_surfaces)
+    row["seconds"] = summary["total"]["wall_seconds"]
+    return row
+
+
+def remove_stale_outputs(paths):
+    """Delete the files among paths that an earlier run left behind."""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+            write_log("Removed " + path + " of an earlier run.")
+
+
+def run_scan(scan, args):
+    """Batch pool entry point: analyze one scheduled scan."""
+    return analyze_scan(scan["path"], scan["output_dir"], args)
+
+
+def main():
+    global log_file_path, logger
+
+    args = parse_args()
+    paths = args.point_cloud_paths
+    if len(paths) == 1:
+        # A single scan writes straight into the temp folder, as before
+        row = analyze_scan(paths[0], args.temp_dir, args)
+        if row["status"] != "ok":
+            sys.exit(1)
+        return
+
+    if not os.path.isdir(args.temp_dir):
+        os.makedirs(args.temp_dir)
+    # One batch log for the whole run; each scan logs to its own folder
+    batch_log_path = os.path.join(args.temp_dir, "batch_log.txt")
+    batch_logger = RunLogger(batch_log_path, args.log_level)
+    log_file_path, logger = batch_log_path, batch_logger
+    scans = [
+        {"path": path, "output_dir": output_dir, "memory": estimate_memory(path)}
+        for path, output_dir in zip(paths, scan_output_dirs(paths, args.temp_dir))
+    ]
+    write_log(
+        "Analyzing {} scans with {} concurrent jobs.".format(len(scans), args.jobs)
+    )
+    if args.jobs > 1:
+        rows = run_batch(
+            scans,
+            partial(run_scan, args=args),
+            args.jobs,
+            int(args.memory_budget * 1024**3),
+            write_log,
+        )
+    else:
+        rows = []
+        for scan in scans:
+            try:
+                rows.append(run_scan(scan, args))
+            except Exception as error:
+                rows.append(failed_row(scan, error))
+            # analyze_scan closed its own log: go back to the batch log
+            log_file_path, logger = batch_log_path, batch_logger
+
+    summary_path = os.path.join(args.temp_dir, "batch_summary.csv")
+    write_summary(rows, summary_path)
+    write_log(format_summary(rows))
+    write_log("Batch summary saved to " + summary_path)
+    logger.close()
+    if any(row["status"] != "ok" for row in rows):
+        sys.exit(1)
 
-# Save detected surfaces
-with open(detected_surfaces_path, "w") as file:
-    json.dump({"detected_surfaces": detected_surfaces}, file, indent=4)
 
-write_log("Feature detection completed. Output saved to " + detected_surfaces_path)
-print("AI Analysis Completed.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Compare the plane segmentation engines on the same scan.
+
+Usage: python benchmarks/bench_engines.py [existing.pts] [min_plane_points]
+
+Without a file, a synthetic village of gabled houses (many roof and wall
+facets) is generated. Normals are estimated once and shared by all engines.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Point_Cloud.downsample import voxel_downsample
+from Point_Cloud.plane_detection import (
+    DISTANCE_THRESHOLD,
+    NORMAL_MAX_NN,
+    NORMAL_RADIUS,
+    NUM_ITERATIONS,
+    estimate_normals,
+    run_plane_engine,
+)
+from Point_Cloud.pts_reader import read_pts
+from Point_Cloud.ransac import DEFAULT_CONFIDENCE
+
+
+def sample_quad(rng, corner, edge_u, edge_v, density):
+    """Uniform points on the parallelogram corner + s * edge_u + t * edge_v."""
+    area = np.linalg.norm(np.cross(edge_u, edge_v))
+    st = rng.uniform(0, 1, size=(int(area * density), 2))
+    return corner + st[:, :1] * edge_u + st[:, 1:] * edge_v
+
+
+def synthetic_village(houses_per_side=4, density=400, seed=0):
+    """Ground plus a grid of gabled houses: 6 facets per house."""
+    rng = np.random.default_rng(seed)
+    spacing = 16.0
+    extent = houses_per_side * spacing
+    parts = [sample_quad(rng, np.zeros(3), [extent, 0, 0], [0, extent, 0], density / 4)]
+    for ix in range(houses_per_side):
+        for iy in range(houses_per_side):
+            x, y = 4 + ix * spacing, 4 + iy * spacing
+            width, depth = 8.0, 6.0 + (ix + iy) % 3
+            eave, ridge = 3.0, 5.0 + (ix * iy) % 2
+            parts += [
+                sample_quad(rng, [x, y, 0], [width, 0, 0], [0, 0, eave], density),
+                sample_quad(
+                    rng, [x, y + depth, 0], [width, 0, 0], [0, 0, eave], density
+                ),
+                sample_quad(rng, [x, y, 0], [0, depth, 0], [0, 0, eave], density),
+                sample_quad(
+                    rng, [x + width, y, 0], [0, depth, 0], [0, 0, eave], density
+                ),
+                sample_quad(
+                    rng,
+                    [x, y, eave],
+                    [width, 0, 0],
+                    [0, depth / 2, ridge - eave],
+                    density,
+                ),
+                sample_quad(
+                    rng,
+                    [x, y + depth, eave],
+                    [width, 0, 0],
+                    [0, -depth / 2, ridge - eave],
+                    density,
+                ),
+            ]
+    points = np.vstack(parts)
+    return points + rng.normal(0, 0.005, size=points.shape)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        points = np.asarray(read_pts(sys.argv[1]).points)
+    else:
+        points = synthetic_village()
+    min_plane_points = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    points, _, _ = voxel_downsample(points, 0.05)
+    start = time.perf_counter()
+    pcd = estimate_normals(points, NORMAL_RADIUS, NORMAL_MAX_NN)
+    print(
+        "{:,d} points, normals in {:.2f} s".format(
+            len(points), time.perf_counter() - start
+        )
+    )
+
+    engines = [
+        ("ransac/open3d", {"engine": "ransac", "ransac": "open3d"}),
+        ("ransac/numpy", {"engine": "ransac", "ransac": "numpy"}),
+        ("region-growing", {"engine": "region-growing", "ransac": "numpy"}),
+    ]
+    for label, engine in engines:
+        params = dict(
+            engine,
+            normal_radius=NORMAL_RADIUS,
+            distance_threshold=DISTANCE_THRESHOLD,
+            num_iterations=NUM_ITERATIONS,
+            min_plane_points=min_plane_points,
+            confidence=DEFAULT_CONFIDENCE,
+            seed=0,
+        )
+        start = time.perf_counter()
+        planes, labels = run_plane_engine(pcd, params, log=lambda message: None)
+        elapsed = time.perf_counter() - start
+        print(
+            "{:<15} {:>5d} planes {:>8.2f} s {:>6.1%} of points assigned".format(
+                label, len(planes), elapsed, np.mean(labels >= 0)
+            )
+        )
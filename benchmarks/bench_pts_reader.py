@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Throughput benchmark: chunked PTS reader vs. the original readlines() loop.
+
+Usage: python benchmarks/bench_pts_reader.py [num_points] [existing.pts]
+
+Also times the parallel ingest at 2, 4, ... workers up to the CPU count.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Point_Cloud.cache import PointCloudCache
+from Point_Cloud.parallel_ingest import ingest_pts_parallel
+from Point_Cloud.pts_reader import read_pts
+
+
+def write_synthetic_pts(path, num_points, seed=0):
+    """Write a random x y z intensity r g b PTS file."""
+    rng = np.random.default_rng(seed)
+    xyz = rng.uniform(-50.0, 50.0, size=(num_points, 3))
+    intensity = rng.integers(-2048, 2047, size=(num_points, 1))
+    rgb = rng.integers(0, 256, size=(num_points, 3))
+    with open(path, "w") as file:
+        file.write(str(num_points) + "\n")
+        np.savetxt(
+            file,
+            np.hstack([xyz, intensity, rgb]),
+            fmt="%.4f %.4f %.4f %d %d %d %d",
+        )
+
+
+def legacy_read(path):
+    """The original analyze_point_cloud.py parse loop."""
+    with open(path, "r") as file:
+        lines = file.readlines()
+    points = []
+    colors = []
+    for line in lines[1:]:
+        values = line.split()
+        if len(values) < 6:
+            continue
+        x, y, z, r, g, b = map(float, values[:6])
+        points.append([x, y, z])
+        colors.append([r / 255, g / 255, b / 255])
+    return np.array(points)
+
+
+def measure(label, function, path):
+    """Run function(path) and print points/sec and peak traced memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count = len(result)
+    print(
+        "{:<10} {:>12,d} pts {:>8.2f} s {:>14,.0f} pts/s {:>10.1f} MB peak".format(
+            label, count, elapsed, count / elapsed, peak / 1e6
+        )
+    )
+    return elapsed
+
+
+def parallel_reader(workers):
+    """Return a read function that ingests with workers processes into a cache."""
+
+    def read(path):
+        cache = PointCloudCache(
+            os.path.join(tempfile.gettempdir(), "bench_cache"), path
+        )
+        ingest_pts_parallel(path, cache, workers)
+        return cache.load().points
+
+    return read
+
+
+if __name__ == "__main__":
+    num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    if len(sys.argv) > 2:
+        pts_path = sys.argv[2]
+    else:
+        pts_path = os.path.join(
+            tempfile.gettempdir(), "bench_{}.pts".format(num_points)
+        )
+        if not os.path.exists(pts_path):
+            print("Writing synthetic PTS file: " + pts_path)
+            write_synthetic_pts(pts_path, num_points)
+
+    legacy_time = measure("legacy", legacy_read, pts_path)
+    chunked_time = measure("chunked", read_pts, pts_path)
+    print("Speedup: {:.1f}x".format(legacy_time / chunked_time))
+
+    workers = 2
+    while workers <= (os.cpu_count() or 1):
+        parallel_time = measure(
+            "{} workers".format(workers), parallel_reader(workers), pts_path
+        )
+        print("Scaling vs. chunked: {:.1f}x".format(chunked_time / parallel_time))
+        workers *= 2
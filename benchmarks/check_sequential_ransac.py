@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Regression check: detect_planes against the original select_by_index loop.
+
+Usage: python benchmarks/check_sequential_ransac.py [existing.pts]
+
+Both run Open3D's sequential RANSAC with the same seed on the same points.
+The residual cloud keeps the same order in both, so the planes must agree
+in count and size; the script exits with status 1 when they do not. The
+default NumPy estimator is timed alongside for comparison.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import open3d as o3d
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_engines import synthetic_village
+from Point_Cloud.downsample import voxel_downsample
+from Point_Cloud.plane_detection import (
+    DISTANCE_THRESHOLD,
+    MIN_REMAINING_POINTS,
+    NUM_ITERATIONS,
+    detect_planes,
+)
+from Point_Cloud.pts_reader import read_pts
+
+
+def legacy_detect_planes(pcd, min_plane_points, seed=0):
+    """The original loop: copy the residual cloud without the inliers per plane."""
+    o3d.utility.random.seed(seed)
+    sizes = []
+    while len(pcd.points) > MIN_REMAINING_POINTS:
+        _, inliers = pcd.segment_plane(
+            distance_threshold=DISTANCE_THRESHOLD,
+            ransac_n=3,
+            num_iterations=NUM_ITERATIONS,
+        )
+        if len(inliers) < min_plane_points:
+            break
+        sizes.append(len(inliers))
+        pcd = pcd.select_by_index(inliers, invert=True)
+    return sizes
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        points = np.asarray(read_pts(sys.argv[1]).points)
+    else:
+        points = synthetic_village(houses_per_side=2)
+    points, _, _ = voxel_downsample(points, 0.05)
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(np.asarray(points, dtype=np.float64))
+    min_plane_points = 500
+
+    start = time.perf_counter()
+    legacy = legacy_detect_planes(pcd, min_plane_points)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    planes, _ = detect_planes(
+        pcd,
+        min_plane_points=min_plane_points,
+        method="open3d",
+        log=lambda message: None,
+    )
+    seconds = time.perf_counter() - start
+    sizes = [len(indices) for _, indices, _ in planes]
+    start = time.perf_counter()
+    numpy_planes, _ = detect_planes(
+        pcd, min_plane_points=min_plane_points, log=lambda message: None
+    )
+    numpy_seconds = time.perf_counter() - start
+
+    print("legacy        {:>4d} planes {:>8.2f} s".format(len(legacy), legacy_seconds))
+    print("detect_planes {:>4d} planes {:>8.2f} s".format(len(sizes), seconds))
+    print(
+        "numpy         {:>4d} planes {:>8.2f} s".format(
+            len(numpy_planes), numpy_seconds
+        )
+    )
+    if sizes != legacy:
+        print("MISMATCH: plane sizes differ")
+        print("legacy:        " + str(legacy))
+        print("detect_planes: " + str(sizes))
+        sys.exit(1)
+    print("OK: same planes and sizes")
@@ -0,0 +1,64 @@
+import argparse
+import json
+import sys
+import time
+
+from Point_Cloud.batch import expand_inputs
+from Point_Cloud.inspector import SAMPLE_WINDOWS, format_report, inspect_point_cloud
+
+# Define default file path
+point_cloud_path = "C:\\Zonneveld\\Point_Clouds\\Huizingalaan_2.pts"
+
+
+def parse_args():
+    """Command line options of the inspector."""
+    parser = argparse.ArgumentParser(
+        description="Report the header, size, extent and density of PTS or LAS "
+        "point clouds from a small sample, without reading the whole file."
+    )
+    parser.add_argument(
+        "point_cloud_paths",
+        nargs="*",
+        default=[point_cloud_path],
+        metavar="point_cloud_path",
+        help="PTS or LAS files, or glob patterns, to inspect.",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=SAMPLE_WINDOWS,
+        help="Evenly spaced windows of the file to sample.",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the reports as JSON instead of text.",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    reports = []
+    failed = False
+    for path in expand_inputs(args.point_cloud_paths):
+        start = time.perf_counter()
+        try:
+            report = inspect_point_cloud(path, args.samples)
+        except (IOError, OSError, ValueError) as error:
+            print("Error inspecting {}: {}".format(path, error), file=sys.stderr)
+            failed = True
+            continue
+        report["seconds"] = time.perf_counter() - start
+        reports.append(report)
+        if not args.json:
+            print(format_report(report))
+            print("  Inspected in {:.3f} s".format(report["seconds"]))
+    if args.json:
+        print(json.dumps(reports, indent=4))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()